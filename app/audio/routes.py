@@ -1,26 +1,39 @@
 import os
-import requests
-from fastapi import APIRouter, UploadFile, File
-from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException, UploadFile, File
 
-load_dotenv()
+from app.services import transcription
 
 router = APIRouter()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+
+def upload_size(file: UploadFile) -> int:
+    if file.size is not None:
+        return file.size
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    return size
+
 
 @router.post("/transcribe")
 async def transcribe_audio(file: UploadFile = File(...)):
-    contents = await file.read()
-
-    with open("temp_audio.webm", "wb") as f:
-        f.write(contents)
+    # The upload is already spooled per request (memory, then a temp file),
+    # so it is streamed to the backend as is.
+    if upload_size(file) > transcription.TRANSCRIPTION_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Audio file too large")
 
-    with open("temp_audio.webm", "rb") as audio_file:
-        response = requests.post(
-            "https://api.openai.com/v1/audio/transcriptions",
-            headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
-            files={"file": ("audio.webm", audio_file, "audio/webm")},
-            data={"model": "whisper-1", "response_format": "text"},
+    try:
+        text = await transcription.transcribe(
+            file.file,
+            file.filename or "audio.webm",
+            file.content_type or "audio/webm",
         )
+    except transcription.TranscriptionBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except transcription.TranscriptionTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except transcription.TranscriptionError as e:
+        print("Transcription error:", e)
+        raise HTTPException(status_code=502, detail="Transcription failed")
 
-    return {"text": response.text}
+    return {"text": text}
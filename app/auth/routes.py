@@ -1,31 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from app.database import get_db
 from app.auth import utils
 from app import models
+from app.services import message_writer
 from app.schemas.user import UserCreate, UserResponse, UserLogin
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
 from uuid import uuid4
 router = APIRouter()
+
+# Page size when a cursor is given without a limit.
+DEFAULT_PAGE_SIZE = 100
 from app.auth.dependencies import get_current_user
 from app.models import User, ChatSession
 from typing import Optional, List
 
 @router.post("/register", response_model=UserResponse)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # 🔹 Normalización
     email_normalized = user.email.strip().lower()
     name_normalized = user.full_name.strip()
 
     # 🔹 Verificación con email normalizado
-    db_user = db.query(models.User).filter(models.User.email == email_normalized).first()
+    db_user = await db.scalar(select(models.User).where(models.User.email == email_normalized))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = utils.hash_password(user.password)
+    try:
+        hashed_password = await utils.ahash_password(user.password)
+    except utils.PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
     # 🔹 Guardado con campos normalizados
     new_user = models.User(
@@ -36,10 +44,10 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
 
     try:
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Error creating user")
 
     return UserResponse(
@@ -51,14 +59,29 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     )
 
 @router.post("/login")
-async def login_user(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def login_user(user: UserLogin, db: AsyncSession = Depends(get_db)):
+    if not utils.login_limiter.allow(user.email):
+        raise HTTPException(status_code=429, detail="Too many login attempts, try again later")
 
-    if not db_user or not utils.verify_password(user.password, db_user.hashed_password):
+    db_user = await db.scalar(select(models.User).where(models.User.email == user.email))
+    if not db_user or not db_user.hashed_password:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    try:
+        valid, new_hash = await utils.averify_password(user.password, db_user.hashed_password)
+    except utils.PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    access_token = utils.create_access_token(data={"sub": db_user.email})
-    refresh_token = utils.create_access_token(data={"sub": db_user.email}, expires_delta=timedelta(days=7))
+    utils.login_limiter.reset(user.email)
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
+
+    claims = utils.token_claims(db_user)
+    access_token = utils.create_access_token(data=claims)
+    refresh_token = utils.create_access_token(data=claims, expires_delta=timedelta(days=7))
 
     return {
         "access_token": access_token,
@@ -74,7 +97,8 @@ class Attachment(BaseModel):
     type: Optional[str] = None
 
 class ChatMessageOut(BaseModel):
-    id: int
+    # None while the message is still queued in the message writer.
+    id: Optional[int]
     session_id: str
     sender: str
     content: str
@@ -92,36 +116,148 @@ class ChatSessionOut(BaseModel):
     class Config:
         orm_mode = True
 
+def sessions_page_query(user_id: int, cursor: Optional[ChatSession] = None, limit: Optional[int] = None):
+    """A user's sessions, most recently active first, after ``cursor``."""
+    query = (
+        select(ChatSession)
+        .where(ChatSession.user_id == user_id)
+        .order_by(ChatSession.last_active.desc(), ChatSession.id.desc())
+    )
+    if cursor is not None:
+        query = query.where(
+            tuple_(ChatSession.last_active, ChatSession.id) < tuple_(cursor.last_active, cursor.id)
+        )
+    return query.limit(limit) if limit is not None else query
+
+
+def messages_page_query(
+    session_id: str,
+    cursor: Optional[models.ChatMessage] = None,
+    newer: bool = False,
+    limit: Optional[int] = None,
+    attachments: bool = True,
+):
+    """A session's messages on one side of ``cursor``, nearest to it first.
+
+    ``newer`` pages forward (ascending); otherwise the page runs backwards
+    from the cursor, or from the latest message without one, and the caller
+    reverses it. Ordering on (timestamp, id) is served by
+    ix_chat_messages_session_ts.
+    """
+    Message = models.ChatMessage
+    columns = [Message.id, Message.session_id, Message.sender, Message.content, Message.timestamp]
+    if attachments:
+        columns.append(Message.attachments)
+    query = select(*columns).where(Message.session_id == session_id)
+
+    key = tuple_(Message.timestamp, Message.id)
+    if cursor is not None:
+        cursor_key = tuple_(cursor.timestamp, cursor.id)
+        query = query.where(key > cursor_key if newer else key < cursor_key)
+    if newer:
+        query = query.order_by(Message.timestamp.asc(), Message.id.asc())
+    else:
+        query = query.order_by(Message.timestamp.desc(), Message.id.desc())
+    return query.limit(limit) if limit is not None else query
+
+
 @router.get("/chat/sessions", response_model=List[ChatSessionOut])
-def get_user_sessions(
-    db: Session = Depends(get_db),
+async def get_user_sessions(
+    before: Optional[str] = Query(None, description="session_id of the last session of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; all sessions when omitted"),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    sessions = (
-        db.query(ChatSession)
-        .filter(ChatSession.user_id == current_user.id)
-        .order_by(ChatSession.last_active.desc())
-        .all()
-    )
-    return sessions
+    """List the user's sessions, most recently active first.
+
+    Without ``before`` or ``limit`` every session is returned, as existing
+    clients expect; paging clients pass ``limit`` and follow ``before``.
+    """
+    cursor = None
+    if before:
+        cursor = await db.scalar(
+            select(ChatSession).filter_by(session_id=before, user_id=current_user.id)
+        )
+        if cursor is None:
+            raise HTTPException(status_code=400, detail="Unknown cursor")
+        if limit is None:
+            limit = DEFAULT_PAGE_SIZE
+    sessions = await db.scalars(sessions_page_query(current_user.id, cursor, limit))
+    return sessions.all()
 
 @router.get("/chat/sessions/{session_id}/messages", response_model=List[ChatMessageOut])
-def get_session_messages(
+async def get_session_messages(
     session_id: str,
-    db: Session = Depends(get_db),
+    before: Optional[int] = Query(None, description="Return messages older than this message id"),
+    after: Optional[int] = Query(None, description="Return messages newer than this message id"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; the whole session when omitted"),
+    attachments: bool = Query(True, description="Set to false to omit attachments"),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    messages = (
-        db.query(models.ChatMessage)
-        .filter(models.ChatMessage.session_id == session_id)
-        .order_by(models.ChatMessage.timestamp.asc())
-        .all()
-    )
+    """Page through a session's messages, oldest first within the page.
+
+    Without a cursor or ``limit`` the whole conversation is returned, as
+    existing clients expect. With a cursor, the page defaults to
+    DEFAULT_PAGE_SIZE messages; with only ``limit``, the most recent
+    ``limit`` messages are returned.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    cursor = None
+    cursor_id = before if before is not None else after
+    if cursor_id is not None:
+        Message = models.ChatMessage
+        cursor = await db.scalar(
+            select(Message).where(Message.id == cursor_id, Message.session_id == session_id)
+        )
+        if cursor is None:
+            raise HTTPException(status_code=400, detail="Unknown cursor")
+        if limit is None:
+            limit = DEFAULT_PAGE_SIZE
+
+    # Taken before the query, so a message committed in between is found
+    # either in the table or here (and deduplicated).
+    queued = message_writer.pending(session_id)
+    newer = after is not None
+    rows = (await db.execute(messages_page_query(session_id, cursor, newer, limit, attachments))).all()
+    if not newer:
+        rows.reverse()
+    messages = [dict(row._mapping) for row in rows]
+
+    # Saved messages are queued (202) before they are written; the page that
+    # ends at the newest message includes them, so a reload right after
+    # sending does not lose them.
+    reaches_end = before is None and (not newer or limit is None or len(messages) < limit)
+    if reaches_end and queued:
+        messages = with_queued(messages, queued, attachments)
+        if limit is not None:
+            messages = messages[:limit] if newer else messages[-limit:]
+    return messages
+
+
+def with_queued(messages: List[dict], queued: List[message_writer.PendingMessage], attachments: bool) -> List[dict]:
+    seen = {(m["timestamp"], m["sender"], m["content"]) for m in messages}
+    for message in queued:
+        if (message.timestamp, message.sender, message.content) in seen:
+            continue
+        future = message.future
+        item = {
+            "id": future.result() if future.done() and not future.exception() else None,
+            "session_id": message.session_id,
+            "sender": message.sender,
+            "content": message.content,
+            "timestamp": message.timestamp,
+        }
+        if attachments:
+            item["attachments"] = message.attachments
+        messages.append(item)
     return messages
 
 @router.post("/chat/sessions")
-def create_session(
-    db: Session = Depends(get_db),
+async def create_session(
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
     try:
@@ -132,8 +268,8 @@ def create_session(
             last_active=datetime.utcnow(),
         )
         db.add(new_session)
-        db.commit()
-        db.refresh(new_session)
+        await db.commit()
+        await db.refresh(new_session)
         print(f"Session created with ID: {new_session.session_id}")
         return {
             "session_id": new_session.session_id,
@@ -141,7 +277,7 @@ def create_session(
             "last_active": new_session.last_active,
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print("Error creating session:", str(e))
         raise HTTPException(status_code=500, detail="Error creating chat session")
 
@@ -156,96 +292,81 @@ class MessageIn(BaseModel):
     content: Optional[str] = ""
     attachments: Optional[List[Attachment]] = []
 
-@router.post("/chat/messages")
-def save_message(
+def first_message_session_name(msg: MessageIn) -> Optional[str]:
+    if msg.attachments and len(msg.attachments) > 0:
+        return f"Análisis {msg.attachments[0].name}"
+    if msg.content and msg.content.strip():
+        name = msg.content.strip()
+        return name[:30] + "..." if len(name) > 30 else name
+    return None
+
+
+@router.post("/chat/messages", status_code=202)
+async def save_message(
     msg: MessageIn,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    try:
-        print(f" Session used: {msg.session_id}")
-
-        session = db.query(models.ChatSession).filter_by(session_id=msg.session_id, user_id=user.id).first()
-        if not session:
-            raise HTTPException(status_code=403, detail="Invalid session or access denied")
-
-        message = models.ChatMessage(
-            session_id=msg.session_id,
-            sender=msg.sender,
-            content=msg.content,
-            timestamp=datetime.utcnow(),
-            attachments=[att.dict() for att in msg.attachments] if msg.attachments else []
-        )
+    """Queue a message for the batched writer.
 
-        db.add(message)
+    The session is renamed by the writer if this is its first user message.
+    """
+    session = await db.scalar(
+        select(models.ChatSession.id).filter_by(session_id=msg.session_id, user_id=user.id)
+    )
+    if not session:
+        raise HTTPException(status_code=403, detail="Invalid session or access denied")
 
-        user_messages_count = (
-            db.query(models.ChatMessage)
-            .filter(
-                models.ChatMessage.session_id == msg.session_id,
-                models.ChatMessage.sender == "user"
-            )
-            .count()
+    try:
+        message_writer.enqueue(
+            msg.session_id,
+            msg.sender,
+            msg.content,
+            attachments=[att.dict() for att in msg.attachments] if msg.attachments else [],
+            session_name=first_message_session_name(msg) if msg.sender == "user" else None,
         )
+    except message_writer.MessageQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-        if user_messages_count == 0 and msg.sender == "user":
-            new_name = None
-            if msg.attachments and len(msg.attachments) > 0:
-                new_name = f"Análisis {msg.attachments[0].name}"
-            elif msg.content and msg.content.strip():
-                new_name = msg.content.strip()
-                new_name = new_name[:30] + "..." if len(new_name) > 30 else new_name
-
-            if new_name:
-                db.query(models.ChatSession).filter_by(session_id=msg.session_id).update({"name": new_name})
-                print(f" Session name updated to: {new_name}")
-
-        db.commit()
-        db.refresh(message)
-        print(" Message saved:", message.id)
-
-        return {"id": message.id}
-
-    except Exception as e:
-        db.rollback()
-        print("Error saving message:", str(e))
-        raise HTTPException(status_code=500, detail="Error saving message")
+    return {"status": "queued"}
 
 @router.delete("/chat/sessions/{session_id}")
-def delete_session(
+async def delete_session(
     session_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    session = db.query(models.ChatSession).filter_by(session_id=session_id, user_id=user.id).first()
+    session = await db.scalar(
+        select(models.ChatSession).filter_by(session_id=session_id, user_id=user.id)
+    )
 
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
     try:
-        db.query(models.ChatMessage).filter_by(session_id=session_id).delete()
-        db.delete(session)
-        db.commit()
+        await db.execute(delete(models.ChatMessage).where(models.ChatMessage.session_id == session_id))
+        await db.delete(session)
+        await db.commit()
         return {"message": f"Session {session_id} deleted successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Error deleting session")
 
 @router.put("/chat/sessions/{session_id}/name")
-def update_session_name(
+async def update_session_name(
     session_id: str,
     new_name: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    session = db.query(ChatSession).filter_by(session_id=session_id, user_id=user.id).first()
+    session = await db.scalar(select(ChatSession).filter_by(session_id=session_id, user_id=user.id))
 
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
     session.name = new_name[:30] + "..." if len(new_name) > 30 else new_name
     session.last_active = datetime.utcnow()
-    db.commit()
+    await db.commit()
 
     print(f" Session name manually updated: {session.name}")
     return {"message": "Session name updated"}
\ No newline at end of file
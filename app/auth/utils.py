@@ -1,22 +1,51 @@
 
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from typing import Optional
-from sqlalchemy.orm import Session
+from typing import Optional, Tuple
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
+from app import metrics
+from app.cache import TTLCache
 from app.database import get_db
 from app.models import User
 
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", "5"))
+LOGIN_WINDOW_SECONDS = float(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
+# Accounts tracked at once; the least recently tried are forgotten first.
+LOGIN_TRACKED_KEYS = int(os.getenv("LOGIN_TRACKED_KEYS", "100000"))
+
+# Hashes with any other cost factor are flagged for rehashing on login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 SECRET_KEY = "SECRET_KEY"  
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "300"))
+
+# Resolved users by id, so authenticated requests skip the users lookup.
+_user_cache = TTLCache(maxsize=AUTH_USER_CACHE_SIZE, ttl=AUTH_USER_CACHE_TTL)
 
 
 
@@ -27,14 +56,79 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordHasherBusy(Exception):
+    pass
+
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_PENDING)
+
+
+async def _run_hasher(fn, *args):
+    """Run a bcrypt call on the hashing pool instead of the event loop."""
+    if not _hash_slots.acquire(blocking=False):
+        metrics.inc("auth.hasher.rejected")
+        raise PasswordHasherBusy("Too many authentication requests, try again later")
+    try:
+        loop = asyncio.get_running_loop()
+        with metrics.timer("auth.hasher.seconds"):
+            return await loop.run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_slots.release()
+
+
+async def ahash_password(password: str) -> str:
+    return await _run_hasher(hash_password, password)
+
+
+async def averify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password, returning a new hash when the stored one needs an upgrade."""
+    return await _run_hasher(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+class LoginRateLimiter:
+    """Sliding-window limit on login attempts per account.
+
+    Keys come from the client, so the attempts live in a bounded TTLCache:
+    an entry expires one window after its last attempt, and at most
+    ``max_keys`` accounts are tracked however many emails are tried.
+    """
+
+    def __init__(self, max_attempts: int, window: float, max_keys: int = LOGIN_TRACKED_KEYS):
+        self.max_attempts = max_attempts
+        self.window = window
+        self._lock = threading.Lock()
+        self._attempts = TTLCache(maxsize=max_keys, ttl=window)
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(key) or deque()
+            while attempts and attempts[0] <= now - self.window:
+                attempts.popleft()
+            if len(attempts) >= self.max_attempts:
+                return False
+            attempts.append(now)
+            self._attempts.set(key, attempts)
+            return True
+
+    def reset(self, key: str):
+        self._attempts.pop(key)
+
+
+login_limiter = LoginRateLimiter(LOGIN_MAX_ATTEMPTS, LOGIN_WINDOW_SECONDS)
+
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
-    token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    print(" JWT created:", token)
-    return token
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def token_claims(user: User) -> dict:
+    return {"sub": user.email, "uid": user.id}
 
 def verify_access_token(token: str) -> Optional[dict]:
     try:
@@ -57,27 +151,55 @@ def verify_access_token(token: str) -> Optional[dict]:
         print("Error decoding JWT:", str(e))
         return None
 
-def get_user_from_token(token: str, db: Session) -> Optional[User]:
+def invalidate_user(user_id: int):
+    _user_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target):
+    if inspect(target).attrs.is_active.history.has_changes():
+        invalidate_user(target.id)
+
+
+async def get_user_from_token(token: str, db: AsyncSession) -> Optional[User]:
+    """Resolve the user of a token, from the cache when possible.
+
+    Tokens carry the user id in ``uid``, so a cached user needs no database
+    round-trip. Tokens issued before that claim existed fall back to the
+    email lookup.
+    """
+    start = time.perf_counter()
     payload = verify_access_token(token)
-    if payload:
-        email = payload.get("sub")
-        
-        user = db.query(User).filter(User.email == email).first()
-        if user:
-            print("Authenticated user:", user.email)
-            return user
+    if not payload:
+        print("Invalid or expired payload")
+        return None
+
+    user_id = payload.get("uid")
+    user = _user_cache.get(user_id) if user_id is not None else None
+    if user is not None:
+        metrics.inc("auth.user_cache.hits")
+    else:
+        metrics.inc("auth.user_cache.misses")
+        if user_id is not None:
+            user = await db.get(User, user_id)
         else:
+            user = await db.scalar(select(User).where(User.email == payload.get("sub")))
+        if user is None:
             print("User not found")
-    else:
-        print("Invalid or expired payload")
-    return None
+            return None
+        _user_cache.set(user.id, user)
+
+    metrics.observe("auth.resolve_seconds", time.perf_counter() - start)
+    if user.is_active is False:
+        return None
+    return user
 
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    user = get_user_from_token(token, db)
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+    user = await get_user_from_token(token, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
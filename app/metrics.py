@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+_histograms = {}
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def inc(name: str, value: float = 1):
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, value: float, buckets=DEFAULT_BUCKETS):
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = {
+                "count": 0,
+                "sum": 0.0,
+                "max": 0.0,
+                "buckets": {str(b): 0 for b in buckets},
+            }
+            hist["_bounds"] = tuple(buckets)
+            _histograms[name] = hist
+        hist["count"] += 1
+        hist["sum"] += value
+        hist["max"] = max(hist["max"], value)
+        for bound in hist["_bounds"]:
+            if value <= bound:
+                hist["buckets"][str(bound)] += 1
+                break
+        else:
+            hist["buckets"]["+Inf"] = hist["buckets"].get("+Inf", 0) + 1
+
+
+@contextmanager
+def timer(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        import resource
+        return pages * resource.getpagesize()
+    except (OSError, ValueError, ImportError):
+        return 0
+
+
+def snapshot() -> dict:
+    with _lock:
+        histograms = {}
+        for name, hist in _histograms.items():
+            histograms[name] = {
+                "count": hist["count"],
+                "sum": hist["sum"],
+                "avg": hist["sum"] / hist["count"] if hist["count"] else 0.0,
+                "max": hist["max"],
+                "buckets": dict(hist["buckets"]),
+            }
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "histograms": histograms,
+        }
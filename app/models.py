@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, TIMESTAMP, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
-from sqlalchemy import Text, DateTime
+from sqlalchemy import Text, DateTime, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 from sqlalchemy.dialects.postgresql import JSON
@@ -28,8 +28,25 @@ class ChatSession(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     name = Column(String, nullable=False)
     last_active = Column(TIMESTAMP, default=datetime.utcnow)
+    has_user_message = Column(
+        Boolean,
+        nullable=False,
+        default=False,
+        server_default=text("false"),
+        info={
+            "backfill": "UPDATE chat_sessions SET has_user_message = true WHERE EXISTS ("
+                        "SELECT 1 FROM chat_messages m WHERE m.session_id = chat_sessions.session_id "
+                        "AND m.sender = 'user')"
+        },
+    )
 
     user = relationship("User", backref="chat_sessions")
+
+    __table_args__ = (
+        Index("ix_chat_sessions_user_last_active", "user_id", "last_active"),
+    )
+
+
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
@@ -40,6 +57,10 @@ class ChatMessage(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     attachments = Column(JSON, nullable=True)
 
+    __table_args__ = (
+        Index("ix_chat_messages_session_ts", "session_id", "timestamp", "id"),
+    )
+
 
 class SessionDocument(Base):
     __tablename__ = "session_documents"
@@ -48,4 +69,33 @@ class SessionDocument(Base):
     session_id = Column(UUID(as_uuid=True), nullable=False)
     filename = Column(String, nullable=False)
     path = Column(String, nullable=False)
-    uploaded_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    uploaded_at = Column(DateTime, default=datetime.utcnow)
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    model_name = Column(String, primary_key=True)
+    text_hash = Column(String(64), primary_key=True)
+    embedding = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class IndexedFile(Base):
+    __tablename__ = "indexed_files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False, index=True)
+    session_id = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    chunk_count = Column(Integer, nullable=False, default=0)
+    indexed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ChatSummary(Base):
+    __tablename__ = "chat_summaries"
+
+    session_id = Column(String, ForeignKey("chat_sessions.session_id", ondelete="CASCADE"), primary_key=True)
+    summary = Column(Text, nullable=False, default="")
+    covered_until_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -1,44 +1,43 @@
+import asyncio
+import hashlib
 import os
 from operator import itemgetter
-from typing import TypedDict
+import re
+import threading
+from collections import deque
+from typing import AsyncIterator, Iterator, Optional, TypedDict
 
 from dotenv import load_dotenv
-from langchain_community.vectorstores.pgvector import PGVector
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import OpenAIEmbeddings
 from langchain_core.runnables import RunnableParallel, RunnableLambda, RunnablePassthrough
 from langchain.retrievers.multi_query import MultiQueryRetriever
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import SQLChatMessageHistory
 from langchain.prompts import PromptTemplate
-from langchain_core.messages import get_buffer_string
-from langchain.embeddings import HuggingFaceEmbeddings
+from langchain_core.messages import HumanMessage, get_buffer_string
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables.config import RunnableConfig
-from langchain_core.runnables import RunnableMap
+from langchain_core.runnables import RunnableGenerator
+from langchain_core.runnables.utils import AddableDict
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
 import time
 
-start = time.time()
+from app import metrics
+from app.cache import TTLCache
+from app.database import SessionLocal
+from app.models import IndexedFile
+from app.services import reranker, session_events
+from app.services.chat_history import PostgresChatMessageHistory
+from app.services.embeddings import embeddings
+from app.services.history_summary import HISTORY_MAX_TURNS, HISTORY_SUMMARY_ENABLED, HISTORY_TOKEN_BUDGET
+from app.services import vector_store
+from app.services.vector_store import STOPWORDS, SessionHybridRetriever, SessionVectorRetriever
 
 load_dotenv()
 
-embeddings = HuggingFaceEmbeddings(
-    model_name="intfloat/e5-large-v2",
-    encode_kwargs={
-        "normalize_embeddings": True,
-        "batch_size": 16
-    }
-)
-
-postgres_url = os.getenv("POSTGRES_URL")
-vector_store = PGVector(
-    collection_name="pdf_vectors_v3",
-    connection_string=postgres_url,
-    embedding_function=embeddings,
-    pre_delete_collection=False,
-    create_extension=False
-)
-
 llm = ChatOpenAI(
     model="gpt-3.5-turbo",
     temperature=0,
@@ -71,81 +70,297 @@ class RagInput(TypedDict):
 class RagConfig(TypedDict):
     session_id: str
 
-def get_multiquery_retriever(session_id: str):
-    return MultiQueryRetriever.from_llm(
-        retriever=vector_store.as_retriever(search_kwargs={
-            "k": 2,
-            "score_threshold": 0.85,
-            "return_source_documents": True,
-            "filter": {"session_id": session_id}
-        }),
-        llm=llm,
-    )
+class FanOutMultiQueryRetriever(MultiQueryRetriever):
+    """MultiQueryRetriever that searches all generated queries at once.
+
+    Queries are embedded in one batch, searched in parallel and merged with
+    reciprocal-rank fusion instead of being run one after another.
+    """
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun):
+        queries = self.generate_queries(query, run_manager)
+        if self.include_original:
+            queries.append(query)
+        return self.retriever.get_many(queries)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun):
+        queries = await self.agenerate_queries(query, run_manager)
+        if self.include_original:
+            queries.append(query)
+        return await self.retriever.aget_many(queries)
+
+
+RETRIEVER_CACHE_SIZE = int(os.getenv("RETRIEVER_CACHE_SIZE", "256"))
+RETRIEVER_CACHE_TTL = float(os.getenv("RETRIEVER_CACHE_TTL", "1800"))
+
+# llm, combined, heuristic or none; see plan_queries.
+RAG_QUERY_MODE = os.getenv("RAG_QUERY_MODE", "llm")
+QUERY_MODES = ("llm", "combined", "heuristic", "none")
+
+# vector: the top RETRIEVER_K chunks per query go to the prompt.
+# rerank: RERANK_CANDIDATES per query are rescored by a local cross-encoder
+# and the best RERANK_TOP_N are kept.
+# hybrid: full-text and vector results are fused, and a question whose exact
+# terms match only a few chunks is answered from those without embedding it.
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "vector")
+RETRIEVAL_MODES = ("vector", "rerank", "hybrid")
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "2"))
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "10"))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "6"))
+# Tokens of retrieved context sent to ANSWER_PROMPT, measured with tiktoken.
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1500"))
+
+_retriever_cache = TTLCache(maxsize=RETRIEVER_CACHE_SIZE, ttl=RETRIEVER_CACHE_TTL)
 
-def format_with_references(output: dict):
 
-    answer = output.get("answer")
-    if hasattr(answer, "content"):
-        answer_text = answer.content
-    elif isinstance(answer, str):
-        answer_text = answer
-    elif hasattr(answer, "text"):
-        answer_text = answer.text
+def session_retriever(session_id: str, k: int, hybrid: bool = False):
+    retriever_class = SessionHybridRetriever if hybrid else SessionVectorRetriever
+    return retriever_class(session_id=session_id, k=k)
+
+
+def get_multiquery_retriever(session_id: str, k: int = RETRIEVER_K, hybrid: bool = False):
+    start = time.perf_counter()
+    retriever = _retriever_cache.get((session_id, k, hybrid))
+    if retriever is None:
+        metrics.inc("rag.retriever_cache.misses")
+        retriever = FanOutMultiQueryRetriever.from_llm(
+            retriever=session_retriever(session_id, k, hybrid),
+            llm=llm,
+        )
+        _retriever_cache.set((session_id, k, hybrid), retriever)
     else:
-        answer_text = str(answer)
+        metrics.inc("rag.retriever_cache.hits")
+    metrics.observe("rag.retriever_setup_seconds", time.perf_counter() - start)
+    return retriever
+
+
+def invalidate_session(session_id: str):
+    for k in (RETRIEVER_K, RERANK_CANDIDATES):
+        for hybrid in (False, True):
+            _retriever_cache.pop((session_id, k, hybrid))
+
+
+session_events.subscribe(invalidate_session)
+
+REFERENCE_TEXT_CHARS = int(os.getenv("REFERENCE_TEXT_CHARS", "300"))
 
-    ref_groups = {}
-    docs = output.get("docs", [])
 
+def format_references(docs: list) -> list:
+    """References to the chunks of the document most of the context came from."""
+    ref_groups = {}
     for doc in docs:
         filename = doc.metadata.get("filename", "unknown.pdf")
-        if filename not in ref_groups:
-            ref_groups[filename] = []
-        ref_groups[filename].append(doc.metadata)
+        ref_groups.setdefault(filename, []).append(doc)
 
     if not ref_groups:
-        return {
-            "answer": answer_text,
-            "references": []
-        }
+        return []
 
     dominant_filename = max(ref_groups, key=lambda k: len(ref_groups[k]))
-    dominant_refs = ref_groups[dominant_filename]
+    return [
+        {
+            "source": dominant_filename,
+            "page": doc.metadata.get("page_number"),
+            "chunk_id": doc.metadata.get("chunk_id"),
+            "text": doc.page_content[:REFERENCE_TEXT_CHARS],
+        }
+        for doc in ref_groups[dominant_filename]
+    ]
 
-    print(f"References of the dominant document: {dominant_filename}")
-    for i, ref in enumerate(dominant_refs):
-        print(f"[{i+1}] {ref.get('source')} | Página: {ref.get('page_number')} | chunk_id: {ref.get('chunk_id')}")
 
-    return {
-    "answer": answer_text,
-    "references": []
-}
+def retrieval_mode(config: RunnableConfig) -> str:
+    mode = (config.get("configurable") or {}).get("retrieval_mode", RAG_RETRIEVAL_MODE)
+    return mode if mode in RETRIEVAL_MODES else RAG_RETRIEVAL_MODE
+
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+
+        _encoding = tiktoken.encoding_for_model(llm.model_name)
+    return len(_encoding.encode(text))
+
+
+def format_context(docs: list) -> str:
+    return "\n\n".join(
+        f"[{doc.metadata.get('filename', 'document')}, page {doc.metadata.get('page_number', '?')}]\n{doc.page_content}"
+        for doc in docs
+    )
+
+
+def fit_context(docs: list, budget: int = RAG_CONTEXT_TOKENS) -> list:
+    """Keep the best-ranked chunks whose formatted context fits ``budget`` tokens."""
+    kept = []
+    used = 0
+    for doc in docs:
+        tokens = count_tokens(format_context([doc])) + 1
+        if kept and used + tokens > budget:
+            break
+        kept.append(doc)
+        used += tokens
+    metrics.observe("rag.context_tokens", used, buckets=(250, 500, 1000, 1500, 2000, 3000, 4000))
+    metrics.observe("rag.context_chunks", len(kept), buckets=(1, 2, 4, 6, 8, 12, 16))
+    return kept
+
+
+def rerank_docs(question: str, docs: list) -> list:
+    start = time.perf_counter()
+    ranked = reranker.rerank(question, docs)[:RERANK_TOP_N]
+    for doc, score in ranked:
+        doc.metadata["rerank_score"] = score
+    metrics.observe("rag.rerank_seconds", time.perf_counter() - start)
+    return [doc for doc, _ in ranked]
+
+
+def known_vectors(x: dict) -> Optional[dict]:
+    """The question's embedding, when the semantic cache lookup computed it."""
+    vector = x.get("question_vector")
+    return {x["question"]: vector} if vector is not None else None
+
+
+def retrieve_context(x: dict, config: RunnableConfig):
+    session_id = config["configurable"]["session_id"]
+    mode = retrieval_mode(config)
+    k = RERANK_CANDIDATES if mode == "rerank" else RETRIEVER_K
+    hybrid = mode == "hybrid"
+    queries = x.get("queries")
+    if queries is None:
+        docs = get_multiquery_retriever(session_id, k, hybrid).invoke(x["question"], config)
+    else:
+        docs = session_retriever(session_id, k, hybrid).get_many(queries, known_vectors(x))
+
+    if mode == "rerank":
+        docs = rerank_docs(x["question"], docs)
+    return fit_context(docs)
+
+
+async def aretrieve_context(x: dict, config: RunnableConfig):
+    session_id = config["configurable"]["session_id"]
+    mode = retrieval_mode(config)
+    k = RERANK_CANDIDATES if mode == "rerank" else RETRIEVER_K
+    hybrid = mode == "hybrid"
+    queries = x.get("queries")
+    if queries is None:
+        docs = await get_multiquery_retriever(session_id, k, hybrid).ainvoke(x["question"], config)
+    else:
+        docs = await session_retriever(session_id, k, hybrid).aget_many(queries, known_vectors(x))
+
+    if mode == "rerank":
+        loop = asyncio.get_running_loop()
+        docs = await loop.run_in_executor(None, rerank_docs, x["question"], docs)
+    return fit_context(docs)
+
+
+class AnswerStream:
+    """Events of one streamed answer.
+
+    The references are sent as soon as retrieval has finished, then every
+    answer token as it arrives, then a final ``done`` event. Chunks are
+    AddableDicts, so the aggregated output (``/rag/invoke``, the history and
+    the semantic cache) is the usual ``{"answer", "references"}`` dict.
+    """
+
+    def __init__(self, x: dict):
+        self.mode = x.get("query_mode", RAG_QUERY_MODE)
+        self.started = x.get("started") or time.perf_counter()
+        self.ttft = None
+
+    def references(self, x: dict) -> AddableDict:
+        metrics.observe(f"rag.references_seconds.{self.mode}", time.perf_counter() - self.started)
+        return AddableDict(references=format_references(x["docs"]))
+
+    def token(self, chunk) -> Optional[AddableDict]:
+        if not chunk.content:
+            return None
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started
+            metrics.observe(f"rag.ttft_seconds.{self.mode}", self.ttft)
+        return AddableDict(answer=chunk.content)
+
+    def done(self) -> AddableDict:
+        metrics.observe(f"rag.answer_seconds.{self.mode}", time.perf_counter() - self.started)
+        return AddableDict(done=True, ttft_seconds=self.ttft)
+
+
+def _answer_input(x: dict) -> dict:
+    return {"context": format_context(x["docs"]), "question": x["question"]}
 
 
+def _merge_input(chunks: Iterator[dict]) -> Iterator[dict]:
+    """The complete input of each run, assembled from its streamed chunks.
+
+    Upstream steps such as RunnablePassthrough.assign stream their keys as
+    separate chunks (the passed-through keys first, ``docs`` later), so the
+    answer can only start once the whole input has arrived.
+    """
+    merged = None
+    for chunk in chunks:
+        merged = AddableDict(chunk) if merged is None else merged + chunk
+    if merged is not None:
+        yield merged
+
+
+async def _amerge_input(chunks: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    merged = None
+    async for chunk in chunks:
+        merged = AddableDict(chunk) if merged is None else merged + chunk
+    if merged is not None:
+        yield merged
+
+
+def stream_answer(inputs: Iterator[dict], config: RunnableConfig) -> Iterator[AddableDict]:
+    for x in _merge_input(inputs):
+        events = AnswerStream(x)
+        yield events.references(x)
+        for chunk in (ANSWER_PROMPT | llm).stream(_answer_input(x), config):
+            event = events.token(chunk)
+            if event is not None:
+                yield event
+        yield events.done()
+
+
+async def astream_answer(inputs: AsyncIterator[dict], config: RunnableConfig) -> AsyncIterator[AddableDict]:
+    async for x in _amerge_input(inputs):
+        events = AnswerStream(x)
+        yield events.references(x)
+        async for chunk in (ANSWER_PROMPT | llm).astream(_answer_input(x), config):
+            event = events.token(chunk)
+            if event is not None:
+                yield event
+        yield events.done()
+
+
+answer_chain = RunnableGenerator(stream_answer, astream_answer)
+
 old_chain = (
-    RunnableMap({
-        "question": itemgetter("question"),
-        "context": RunnableLambda(
-            lambda x, config: get_multiquery_retriever(
-                config["configurable"]["session_id"]
-            ).invoke(x["question"])
-        ),
-    }) |
-    RunnableLambda(lambda x: {
-        "question": x["question"],
-        "context": x["context"],
-        "docs": x["context"]
-    }) |
-    RunnableMap({
-        "answer": ANSWER_PROMPT | llm,
-        "docs": itemgetter("docs")
-    }) |
-    RunnableLambda(format_with_references)
+    RunnablePassthrough.assign(docs=RunnableLambda(retrieve_context, afunc=aretrieve_context)) |
+    answer_chain
 ).with_types(input_type=RagInput)
 
-get_session_history = lambda session_id: SQLChatMessageHistory(
-    connection_string=postgres_url,
-    session_id=session_id
+
+def lexical_shortcut(x: dict, config: RunnableConfig) -> Optional[list]:
+    """In hybrid mode, the few chunks matching the question's exact terms."""
+    if retrieval_mode(config) != "hybrid":
+        return None
+    docs = vector_store.exact_match(config["configurable"]["session_id"], x["question"])
+    if docs is None:
+        return None
+    metrics.inc("rag.lexical_shortcut")
+    return fit_context(docs)
+
+# The client saves both turns through /auth/chat/messages (with attachments),
+# so the chain only reads history and must not write the turn a second time.
+# The window holds the last HISTORY_MAX_TURNS turns plus the question the
+# client just saved; older turns are only present through the summary.
+get_session_history = lambda session_id: PostgresChatMessageHistory(
+    session_id=session_id,
+    persist=False,
+    max_messages=2 * HISTORY_MAX_TURNS + 1,
+    token_budget=HISTORY_TOKEN_BUDGET,
+    summary=HISTORY_SUMMARY_ENABLED,
 )
 
 template_with_history = """
@@ -162,7 +377,7 @@ standalone_question_prompt = PromptTemplate.from_template(template_with_history)
 
 standalone_question_mini_chain = (
     RunnableParallel(
-        question=RunnablePassthrough(),
+        question=itemgetter("question"),
         chat_history=lambda x: get_buffer_string(x["chat_history"])
     )
     | standalone_question_prompt
@@ -170,9 +385,212 @@ standalone_question_mini_chain = (
     | (lambda msg: {"question": msg.content})
 )
 
+template_combined = """
+Given the following conversation history and a follow-up question,
+rewrite the question so that it can stand alone, without requiring prior context,
+while preserving its original language.
+Then write {n_variants} different versions of that standalone question to retrieve
+relevant documents from a vector database, in the same language.
+Write the standalone question on the first line and each version on its own line,
+without numbering or any other text.
+History of the conversation:
+{chat_history}
+Follow-up question: {question}
+"""
+
+combined_query_prompt = PromptTemplate.from_template(template_combined)
+
+
+def expand_heuristic(question: str) -> list:
+    """Question plus a keyword-only variant, without any model call."""
+    keywords = [
+        word for word in re.findall(r"\w+", question.lower())
+        if word not in STOPWORDS and len(word) > 2
+    ]
+    queries = [question]
+    if keywords and " ".join(keywords) != question.lower():
+        queries.append(" ".join(keywords))
+    return queries
+
+
+def plan_queries(x: dict, config: RunnableConfig):
+    """Produce the standalone question and the retrieval queries.
+
+    Modes (RAG_QUERY_MODE, or ``query_mode`` in the configurable):
+    - llm: rewrite, then MultiQueryRetriever generates variants (two calls)
+    - combined: rewrite and variants in a single call
+    - heuristic: rewrite, then local keyword expansion
+    - none: rewrite only
+
+    The rewrite is skipped whenever the chat history is empty.
+    """
+    started = time.perf_counter()
+    mode = (config.get("configurable") or {}).get("query_mode", RAG_QUERY_MODE)
+    if mode not in QUERY_MODES:
+        mode = RAG_QUERY_MODE
+    question = x["question"]
+    history = x.get("chat_history") or []
+    # The client saves the question before asking it; it is not history yet.
+    if history and isinstance(history[-1], HumanMessage) and history[-1].content == question:
+        history = history[:-1]
+        x = {**x, "chat_history": history}
+
+    if mode == "combined":
+        message = (combined_query_prompt | llm).invoke({
+            "question": question,
+            "chat_history": get_buffer_string(history),
+            "n_variants": 3,
+        }, config)
+        lines = [line.strip() for line in message.content.splitlines() if line.strip()]
+        standalone = lines[0] if lines and history else question
+        queries = [standalone] + lines[1:]
+    else:
+        standalone = question
+        if history:
+            standalone = standalone_question_mini_chain.invoke(x, config)["question"]
+        if mode == "heuristic":
+            queries = expand_heuristic(standalone)
+        elif mode == "none":
+            queries = [standalone]
+        else:
+            queries = None
+
+    return {
+        "question": standalone,
+        "queries": queries,
+        "query_mode": mode,
+        "started": started,
+    }
+
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_DOCUMENT_SETS = int(os.getenv("SEMANTIC_CACHE_DOCUMENT_SETS", "512"))
+SEMANTIC_CACHE_ENTRIES_PER_SET = int(os.getenv("SEMANTIC_CACHE_ENTRIES_PER_SET", "64"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+
+class SemanticCache:
+    """Answers keyed by session, document-set fingerprint and question embedding.
+
+    A lookup hits when a cached question for the same set of documents has a
+    cosine similarity of at least ``threshold`` (embeddings are normalized).
+    Entries are scoped to one session, since the cached references name the
+    files of the user who uploaded them.
+    """
+
+    def __init__(self, max_sets: int, entries_per_set: int, ttl: float, threshold: float):
+        self.entries_per_set = entries_per_set
+        self.ttl = ttl
+        self.threshold = threshold
+        self._sets = TTLCache(maxsize=max_sets, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def lookup(self, fingerprint: str, vector: list):
+        entries = self._sets.get(fingerprint)
+        if not entries:
+            return None
+        now = time.monotonic()
+        best, best_score = None, self.threshold
+        with self._lock:
+            for cached_vector, value, expires_at in entries:
+                if expires_at < now:
+                    continue
+                score = sum(a * b for a, b in zip(vector, cached_vector))
+                if score >= best_score:
+                    best, best_score = value, score
+        return best
+
+    def store(self, fingerprint: str, vector: list, value: dict):
+        with self._lock:
+            entries = self._sets.get(fingerprint)
+            if entries is None:
+                entries = deque(maxlen=self.entries_per_set)
+            entries.append((vector, value, time.monotonic() + self.ttl))
+            self._sets.set(fingerprint, entries)
+
+
+semantic_cache = SemanticCache(
+    max_sets=SEMANTIC_CACHE_DOCUMENT_SETS,
+    entries_per_set=SEMANTIC_CACHE_ENTRIES_PER_SET,
+    ttl=SEMANTIC_CACHE_TTL,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+)
+_fingerprints = TTLCache(maxsize=RETRIEVER_CACHE_SIZE, ttl=RETRIEVER_CACHE_TTL)
+
+
+def document_set_fingerprint(session_id: str) -> Optional[str]:
+    """Hash of the content hashes indexed in a session, None if it has none."""
+    fingerprint = _fingerprints.get(session_id)
+    if fingerprint is None:
+        db = SessionLocal()
+        try:
+            hashes = sorted({
+                row.content_hash
+                for row in db.query(IndexedFile.content_hash).filter(IndexedFile.session_id == session_id)
+            })
+        finally:
+            db.close()
+        fingerprint = hashlib.sha256("\n".join(hashes).encode()).hexdigest() if hashes else ""
+        _fingerprints.set(session_id, fingerprint)
+    return fingerprint or None
+
+
+def _invalidate_fingerprint(session_id: str):
+    _fingerprints.pop(session_id)
+
+
+session_events.subscribe(_invalidate_fingerprint)
+
+
+def answer_with_cache(x: dict, config: RunnableConfig):
+    # Checked before the cache, so a shortcut answer needs no embedding.
+    docs = lexical_shortcut(x, config)
+    if docs is not None:
+        return RunnablePassthrough.assign(docs=lambda _: docs) | answer_chain
+
+    if not SEMANTIC_CACHE_ENABLED:
+        return old_chain
+    session_id = config["configurable"]["session_id"]
+    fingerprint = document_set_fingerprint(session_id)
+    if fingerprint is None:
+        return old_chain
+    fingerprint = f"{session_id}:{fingerprint}"
+
+    vector = embeddings.embed_query(x["question"])
+    cached = semantic_cache.lookup(fingerprint, vector)
+    if cached is not None:
+        metrics.inc("rag.semantic_cache.hits")
+        return cached
+    metrics.inc("rag.semantic_cache.misses")
+
+    def remember(chunks: Iterator[AddableDict]) -> Iterator[AddableDict]:
+        output = AddableDict()
+        for chunk in chunks:
+            output = output + chunk
+            yield chunk
+        output.pop("ttft_seconds", None)
+        semantic_cache.store(fingerprint, vector, output)
+
+    async def aremember(chunks: AsyncIterator[AddableDict]) -> AsyncIterator[AddableDict]:
+        output = AddableDict()
+        async for chunk in chunks:
+            output = output + chunk
+            yield chunk
+        output.pop("ttft_seconds", None)
+        semantic_cache.store(fingerprint, vector, output)
+
+    # Retrieval reuses the lookup's embedding of the question.
+    return (
+        RunnablePassthrough.assign(question_vector=lambda _: vector) |
+        old_chain |
+        RunnableGenerator(remember, aremember)
+    )
+
+
 final_chain = (
     RunnableWithMessageHistory(
-        runnable=standalone_question_mini_chain | old_chain,
+        runnable=RunnableLambda(plan_queries) | RunnableLambda(answer_with_cache),
         input_messages_key="question",
         history_messages_key="chat_history",
         output_messages_key="answer",
@@ -180,6 +598,4 @@ final_chain = (
         configurable_fields=["session_id"]
     )
     .with_types(input_type=RagInput)
-)
-
-print(f"⏱ Total LangChain Time: {time.time() - start:.2f}s")
\ No newline at end of file
+)
\ No newline at end of file
@@ -1,29 +1,51 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Depends
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
-from langserve import add_routes
-from starlette.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from uuid import UUID, uuid4
-from sqlalchemy.orm import Session
 import os
 import shutil
 import subprocess
 
-from app.auth import routes as auth_routes
-from app.database import engine, get_db
-from app.models import Base, SessionDocument
-from app.services.pdf_indexer import process_and_index_pdf
-from app.rag_chain import final_chain
-from app.audio import routes as audio_routes
-from app.auth.dependencies import get_current_user
-from app.models import ChatSession, User
+from app import startup
+
+with startup.phase("import.frameworks"):
+    from langserve import add_routes
+    from starlette.staticfiles import StaticFiles
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+with startup.phase("import.database"):
+    from app.database import create_missing_columns, create_missing_indexes, engine, get_db
+    from app.models import Base, SessionDocument
+    from app.models import ChatSession, User
+
+with startup.phase("import.auth"):
+    from app.auth import routes as auth_routes
+    from app.auth.dependencies import get_current_user
+
+with startup.phase("import.ingestion"):
+    from app.services import ingestion, message_writer, uploads
+
+with startup.phase("import.rag_chain"):
+    from app.rag_chain import RAG_RETRIEVAL_MODE, final_chain
+
+with startup.phase("import.audio"):
+    from app.audio import routes as audio_routes
+    from app.services import transcription
+
+from app import metrics
+from app.services import reranker
+from app.services.embeddings import get_model
+from app.services.vector_store import get_vector_store
 
 
 app = FastAPI()
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 
+# Added first so it runs inside CORS and its 413 carries the CORS headers.
+app.add_middleware(uploads.UploadSizeLimit, path="/upload")
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -36,7 +58,43 @@ app.add_middleware(
 )
 
 
-Base.metadata.create_all(bind=engine)
+def prepare_schema():
+    Base.metadata.create_all(bind=engine)
+    create_missing_columns()
+    create_missing_indexes()
+
+
+startup.register("schema", prepare_schema)
+startup.register("vector_store", get_vector_store, required=False)
+startup.register("embeddings", get_model, required=False)
+if RAG_RETRIEVAL_MODE == "rerank":
+    startup.register("reranker", reranker.get_model, required=False)
+
+
+@app.on_event("startup")
+def warm_up():
+    startup.start()
+
+
+@app.get("/health/live", tags=["ops"])
+async def liveness():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", tags=["ops"])
+async def readiness():
+    report = startup.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+@app.on_event("shutdown")
+def flush_message_writer():
+    message_writer.flush()
+
+
+@app.on_event("shutdown")
+async def close_transcription_client():
+    await transcription.aclose()
 
 
 app.include_router(auth_routes.router, prefix="/auth", tags=["auth"])
@@ -54,52 +112,75 @@ async def redirect_root_to_docs():
     return RedirectResponse("/docs")
 
 
-@app.post("/upload", tags=["PDFs"])
+@app.get("/metrics", tags=["ops"])
+async def get_metrics():
+    return metrics.snapshot()
+
+
+@app.post("/upload", tags=["PDFs"], status_code=202)
 async def upload_pdf(
     session_id: UUID = Form(...),
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(get_current_user),  
 ):
-    session = db.query(ChatSession).filter_by(session_id=str(session_id), user_id=user.id).first()
+    session = await db.scalar(select(ChatSession).filter_by(session_id=str(session_id), user_id=user.id))
     if not session:
         raise HTTPException(status_code=403, detail="Invalid session_id or access denied")
 
+    filename = os.path.basename(file.filename or "")
+    if not filename:
+        raise HTTPException(status_code=400, detail="Missing filename")
+
     try:
         save_dir = f"./pdf-documents/{session_id}"
         os.makedirs(save_dir, exist_ok=True)
-        save_path = os.path.join(save_dir, file.filename)
-        print(">>> Guardando archivo en:", save_path)
-
-        with open(save_path, "wb") as f:
-            f.write(await file.read())
-
-        print(">>> Archivo guardado correctamente:", save_path)
+        save_path = os.path.join(save_dir, filename)
 
-        
-        print(">>> Verificando contenido de carpeta:", save_dir)
         try:
-            archivos = os.listdir(save_dir)
-            print(">>> Archivos actuales:", archivos)
-        except Exception as e:
-            print(">>> Error al listar archivos:", e)
-
-        doc = SessionDocument(
-            id=uuid4(),
-            session_id=session_id,
-            filename=file.filename,
-            path=save_path,
+            size, content_hash = await uploads.save_upload(file, save_path)
+        except uploads.UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        print(f"Saved {save_path} ({size} bytes)")
+
+        # Re-uploading a file keeps its single document row; indexing it
+        # again is skipped by the content hash.
+        existing = await db.scalar(
+            select(SessionDocument.id).filter_by(session_id=session_id, filename=filename)
         )
-        db.add(doc)
-        db.commit()
+        if existing is None:
+            db.add(SessionDocument(
+                id=uuid4(),
+                session_id=session_id,
+                filename=filename,
+                path=save_path,
+            ))
+            await db.commit()
 
         try:
-            process_and_index_pdf(str(session_id), save_path)
-        except Exception as e:
-            print(">>> Error en process_and_index_pdf:", e)
-            raise HTTPException(status_code=500, detail=f"PDF indexing failed: {str(e)}")
+            job = ingestion.submit(str(session_id), user.id, filename, save_path, content_hash=content_hash)
+        except ingestion.IngestionQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e))
+
+        return {
+            "message": "File uploaded, indexing queued",
+            "filename": filename,
+            "job_id": job.id,
+            "content_hash": content_hash,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {"message": "File uploaded and processed", "filename": file.filename}
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+@app.get("/upload/jobs/{job_id}", tags=["PDFs"])
+async def get_upload_job(
+    job_id: str,
+    user: User = Depends(get_current_user),
+):
+    job = ingestion.get_job(job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
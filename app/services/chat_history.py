@@ -0,0 +1,114 @@
+from typing import List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, SystemMessage
+from sqlalchemy import delete, select
+
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models import ChatMessage, ChatSummary
+from app.services import history_summary, message_writer
+
+MESSAGE_SENDERS = {"human": "user", "ai": "ai"}
+
+
+class PostgresChatMessageHistory(BaseChatMessageHistory):
+    """Chat history stored in ``chat_messages``, the table the UI reads.
+
+    Writes go through the batched message writer; reads include messages
+    that are still queued, so a turn is visible as soon as it was saved.
+    With ``persist=False`` the history is read-only, for callers whose turns
+    are already saved through ``/auth/chat/messages``.
+
+    With ``max_messages`` only that many of the latest messages are loaded,
+    trimmed further to ``token_budget`` tokens. With ``summary`` the stored
+    summary of the older messages is prepended as a system message, and
+    messages that left the window are folded into it in the background.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        persist: bool = True,
+        max_messages: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        summary: bool = False,
+    ):
+        self.session_id = session_id
+        self.persist = persist
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.summary = summary
+
+    def _query(self):
+        query = select(ChatMessage.id, ChatMessage.timestamp, ChatMessage.sender, ChatMessage.content).where(
+            ChatMessage.session_id == self.session_id
+        )
+        if self.max_messages is None:
+            return query.order_by(ChatMessage.timestamp.asc(), ChatMessage.id.asc())
+        return query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(self.max_messages)
+
+    def _to_messages(self, rows, queued, summary: Optional[ChatSummary]) -> List[BaseMessage]:
+        rows = [tuple(row) for row in rows]
+        if self.max_messages is not None:
+            rows.reverse()
+        # Queued messages are snapshotted before the query, so one committed
+        # in between shows up in both and is skipped here.
+        seen = {row[1:] for row in rows}
+        rows += [(None, m.timestamp, m.sender, m.content) for m in queued if (m.timestamp, m.sender, m.content) not in seen]
+
+        truncated = False
+        if self.max_messages is not None and len(rows) >= self.max_messages:
+            rows = rows[-self.max_messages:]
+            truncated = True
+
+        pairs = [(row[0], history_summary.to_message(row[2], row[3])) for row in rows]
+        pairs = [(message_id, message) for message_id, message in pairs if message]
+        if self.token_budget is not None:
+            kept = history_summary.fit_budget([message for _, message in pairs], self.token_budget)
+            truncated = truncated or len(kept) < len(pairs)
+            pairs = pairs[len(pairs) - len(kept):]
+
+        stored_ids = [message_id for message_id, _ in pairs if message_id is not None]
+        if self.summary and truncated and stored_ids:
+            history_summary.schedule_refresh(self.session_id, stored_ids[0])
+
+        messages = [message for _, message in pairs]
+        if summary is not None and summary.summary:
+            messages.insert(0, SystemMessage(content=f"Summary of the earlier conversation: {summary.summary}"))
+        return messages
+
+    @property
+    def messages(self) -> List[BaseMessage]:  # type: ignore
+        queued = message_writer.pending(self.session_id)
+        with SessionLocal() as db:
+            rows = db.execute(self._query()).tuples().all()
+            summary = db.get(ChatSummary, self.session_id) if self.summary else None
+        return self._to_messages(rows, queued, summary)
+
+    async def aget_messages(self) -> List[BaseMessage]:
+        queued = message_writer.pending(self.session_id)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(self._query())).tuples().all()
+            summary = await db.get(ChatSummary, self.session_id) if self.summary else None
+        return self._to_messages(rows, queued, summary)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not self.persist:
+            return
+        for message in messages:
+            message_writer.enqueue(self.session_id, MESSAGE_SENDERS.get(message.type, message.type), message.content)
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.add_messages(messages)
+
+    def clear(self) -> None:
+        if not self.persist:
+            return
+        message_writer.flush()
+        with SessionLocal() as db:
+            db.execute(delete(ChatSummary).where(ChatSummary.session_id == self.session_id))
+            db.execute(delete(ChatMessage).where(ChatMessage.session_id == self.session_id))
+            db.commit()
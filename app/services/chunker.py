@@ -0,0 +1,207 @@
+import os
+import re
+import threading
+from typing import Iterable, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from app import metrics
+from app.services.embeddings import EMBEDDING_MAX_SEQ_LENGTH, EMBEDDING_MODEL_NAME
+
+load_dotenv()
+
+# Leaves room under the model's sequence length for the special tokens.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", str(EMBEDDING_MAX_SEQ_LENGTH - 32)))
+# A section with fewer tokens than this is continued by the next section
+# instead of becoming a chunk of its own.
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "32"))
+
+TITLE_CATEGORIES = {"Title"}
+TABLE_CATEGORIES = {"Table"}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """Tokenizer of the embedding model, loaded without the model weights."""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                from transformers import AutoTokenizer
+
+                _tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME)
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    return len(get_tokenizer().encode(text, add_special_tokens=False))
+
+
+class StructuredChunker:
+    """Groups Unstructured elements into chunks of at most ``max_tokens``.
+
+    A Title starts a new section: the pending chunk is closed and the title
+    is carried as a prefix of every chunk of its section. After a section
+    shorter than ``min_tokens``, the next heading continues the same chunk
+    instead, but only if its first text fits there; otherwise the heading
+    moves on with its text, so a heading is never the tail of a chunk.
+    Consecutive headings are stacked, and headings with no text at the end
+    of the document become a chunk of their own. Tables are kept whole in
+    chunks of their own, split by rows only when they exceed the budget.
+    Other elements are packed in reading order; one that is too long on its
+    own is split at sentence ends, and as a last resort by tokens. Token
+    counts come from the embedding model's tokenizer, so no chunk is
+    truncated by the model.
+    """
+
+    def __init__(self, max_tokens: int = CHUNK_MAX_TOKENS, min_tokens: int = CHUNK_MIN_TOKENS):
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self.chunk_count = 0
+        self.token_total = 0
+
+    @property
+    def average_tokens(self) -> float:
+        return self.token_total / self.chunk_count if self.chunk_count else 0.0
+
+    def split(self, elements: Iterable[Document]) -> Iterator[Document]:
+        section: Optional[str] = None
+        section_metadata: dict = {}
+        # False until the latest heading has text after it.
+        has_body = False
+        # A heading continuing the pending chunk, and its tokens there.
+        next_section: Optional[str] = None
+        heading_tokens = 0
+        parts: List[str] = []
+        tokens = 0
+        metadata: Optional[dict] = None
+
+        def flush():
+            nonlocal section, next_section, parts, tokens, metadata
+            if parts:
+                yield self._chunk(section, "\n\n".join(parts), metadata, "Text")
+            if next_section is not None:
+                section, next_section = next_section, None
+            parts, tokens, metadata = [], 0, None
+
+        def detach_heading():
+            # The continuing heading has no text in this chunk; flush() then
+            # makes it the section of the next one.
+            nonlocal tokens
+            parts.pop()
+            tokens -= heading_tokens
+
+        for element in elements:
+            category = element.metadata.get("category", "Text")
+            text = element.page_content.strip()
+            if category in TITLE_CATEGORIES and count_tokens(text) > self.max_tokens // 4:
+                # Too long to be a real heading, keep it as text.
+                category = "Text"
+            heading_pending = next_section is not None and not has_body
+
+            if category in TITLE_CATEGORIES:
+                if heading_pending:
+                    next_section = f"{next_section}\n{text}"
+                    parts[-1] = next_section
+                    tokens -= heading_tokens
+                    heading_tokens = count_tokens(next_section)
+                    tokens += heading_tokens
+                elif parts and tokens < self.min_tokens:
+                    # Too little under the previous heading to stand alone,
+                    # so the next section continues this chunk.
+                    heading_tokens = count_tokens(text)
+                    parts.append(text)
+                    tokens += heading_tokens
+                    next_section = text
+                else:
+                    yield from flush()
+                    section = f"{section}\n{text}" if section is not None and not has_body else text
+                section_metadata = element.metadata
+                has_body = False
+                continue
+
+            if category in TABLE_CATEGORIES:
+                if heading_pending:
+                    detach_heading()
+                yield from flush()
+                for piece in self._fit(text, self._budget(section), separator="\n"):
+                    yield self._chunk(section, piece, element.metadata, category)
+                has_body = True
+                continue
+
+            budget = self._budget(section)
+            pieces = self._fit(text, budget)
+            while pieces:
+                piece = pieces.pop(0)
+                piece_tokens = count_tokens(piece)
+                if parts and tokens + piece_tokens > budget:
+                    if next_section is not None and not has_body:
+                        detach_heading()
+                    yield from flush()
+                    budget = self._budget(section)
+                    if piece_tokens > budget:
+                        # The new section's heading leaves less room.
+                        pieces[:0] = self._fit(piece, budget)
+                        continue
+                if metadata is None:
+                    metadata = element.metadata
+                parts.append(piece)
+                tokens += piece_tokens
+                has_body = True
+
+        if next_section is not None and not has_body:
+            detach_heading()
+        yield from flush()
+        if section is not None and not has_body:
+            # Headings with nothing after them, e.g. a document made only of
+            # headings.
+            yield self._chunk(None, section, section_metadata, "Title")
+
+    def _budget(self, section: Optional[str]) -> int:
+        heading = count_tokens(section) + 2 if section else 0
+        return max(self.max_tokens - heading, self.max_tokens // 2)
+
+    def _fit(self, text: str, budget: int, separator: Optional[str] = None) -> List[str]:
+        """Split ``text`` into pieces of at most ``budget`` tokens."""
+        if count_tokens(text) <= budget:
+            return [text]
+
+        units = text.split(separator) if separator else _SENTENCE_END.split(text)
+        joiner = separator or " "
+        pieces, current = [], []
+        for unit in units:
+            if count_tokens(unit) > budget:
+                if current:
+                    pieces.append(joiner.join(current))
+                    current = []
+                pieces.extend(self._split_tokens(unit, budget))
+                continue
+            if current and count_tokens(joiner.join(current + [unit])) > budget:
+                pieces.append(joiner.join(current))
+                current = []
+            current.append(unit)
+        if current:
+            pieces.append(joiner.join(current))
+        return pieces
+
+    def _split_tokens(self, text: str, budget: int) -> List[str]:
+        tokenizer = get_tokenizer()
+        ids = tokenizer.encode(text, add_special_tokens=False)
+        return [tokenizer.decode(ids[i:i + budget]) for i in range(0, len(ids), budget)]
+
+    def _chunk(self, section: Optional[str], body: str, metadata: Optional[dict], category: str) -> Document:
+        text = f"{section}\n\n{body}" if section else body
+        token_count = count_tokens(text)
+        self.chunk_count += 1
+        self.token_total += token_count
+        metrics.observe("chunker.tokens_per_chunk", token_count, buckets=(32, 64, 128, 256, 384, 448, 512))
+        chunk_metadata = {k: v for k, v in (metadata or {}).items() if k != "category"}
+        chunk_metadata.update(category=category, token_count=token_count)
+        if section:
+            chunk_metadata["section"] = section[:200]
+        return Document(page_content=text, metadata=chunk_metadata)
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+from dotenv import load_dotenv
+
+from app import metrics
+
+load_dotenv()
+
+EMBEDDING_BATCH_ENABLED = os.getenv("EMBEDDING_BATCH_ENABLED", "true").lower() == "true"
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class PendingQuery:
+    def __init__(self, text: str):
+        self.text = text
+        self.enqueued = time.perf_counter()
+        self.future: Future = Future()
+
+
+class QueryBatcher:
+    """Collects query texts from concurrent requests into shared forward passes.
+
+    A single worker thread takes the first waiting query, keeps collecting
+    for up to ``max_wait_ms`` or until ``max_size`` texts, and embeds them
+    with one ``encode`` call. Each caller gets its vector through its own
+    future; an encode error is set on every future of the batch.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]],
+                 max_size: int = EMBEDDING_BATCH_MAX_SIZE, max_wait_ms: float = EMBEDDING_BATCH_MAX_WAIT_MS):
+        self.encode = encode
+        self.max_size = max_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.Queue[PendingQuery]" = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self) -> List[PendingQuery]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _embed(self, batch: List[PendingQuery]):
+        # Identical questions in flight (retries, the same variant from two
+        # chains) are embedded once.
+        texts = list(dict.fromkeys(item.text for item in batch))
+        start = time.perf_counter()
+        try:
+            vectors = dict(zip(texts, self.encode(texts)))
+        except Exception as e:
+            print("Batched query embedding failed:", e)
+            for item in batch:
+                item.future.set_exception(e)
+            return
+
+        now = time.perf_counter()
+        for item in batch:
+            metrics.observe("embeddings.batch_wait_seconds", start - item.enqueued)
+            item.future.set_result(vectors[item.text])
+        metrics.observe("embeddings.batch_size", len(texts), buckets=BATCH_SIZE_BUCKETS)
+        metrics.observe("embeddings.batch_seconds", now - start)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            # Queries still waiting once this batch is full or its wait is over.
+            metrics.observe("embeddings.queue_depth", self._queue.qsize(), buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128, 256))
+            self._embed(batch)
+
+    def submit(self, texts: List[str]) -> List[Future]:
+        self._ensure_thread()
+        items = [PendingQuery(text) for text in texts]
+        for item in items:
+            self._queue.put(item)
+        return [item.future for item in items]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [future.result() for future in self.submit(texts)]
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """Like embed(), without tying up a thread while the batch runs."""
+        return list(await asyncio.gather(*(asyncio.wrap_future(future) for future in self.submit(texts))))
@@ -0,0 +1,102 @@
+import hashlib
+import threading
+import unicodedata
+from array import array
+from typing import List
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app import metrics
+from app.database import SessionLocal
+from app.models import EmbeddingCacheEntry
+from app.services.embeddings import EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, embeddings
+
+# Stored in the model_name column. The backends' vectors differ slightly
+# (most of all onnx-int8), so each backend keeps its own entries.
+CACHE_MODEL_KEY = f"{EMBEDDING_MODEL_NAME}:{EMBEDDING_BACKEND}"
+
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def file_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _encode(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _decode(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+def _record(hits: int, misses: int):
+    global _hits, _misses
+    metrics.inc("embedding_cache.hits", hits)
+    metrics.inc("embedding_cache.misses", misses)
+    with _lock:
+        _hits += hits
+        _misses += misses
+        total = _hits + _misses
+        metrics.set_gauge("embedding_cache.hit_rate", _hits / total if total else 0.0)
+
+
+def embed_documents_cached(texts: List[str]) -> List[List[float]]:
+    """Embed ``texts``, reusing vectors stored for identical chunks.
+
+    Entries are keyed by model name and backend plus the SHA-256 of the
+    normalized chunk text, so only chunks never seen by this model and
+    backend go through inference.
+    """
+    hashes = [text_hash(t) for t in texts]
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(EmbeddingCacheEntry)
+            .filter(
+                EmbeddingCacheEntry.model_name == CACHE_MODEL_KEY,
+                EmbeddingCacheEntry.text_hash.in_(set(hashes)),
+            )
+            .all()
+        )
+        vectors = {row.text_hash: _decode(row.embedding) for row in rows}
+
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in vectors and h not in missing:
+                missing[h] = t
+
+        if missing:
+            new_vectors = embeddings.embed_documents(list(missing.values()))
+            entries = []
+            for h, vector in zip(missing.keys(), new_vectors):
+                vectors[h] = vector
+                entries.append({
+                    "model_name": CACHE_MODEL_KEY,
+                    "text_hash": h,
+                    "embedding": _encode(vector),
+                })
+            db.execute(insert(EmbeddingCacheEntry).values(entries).on_conflict_do_nothing())
+            db.commit()
+    finally:
+        db.close()
+
+    _record(len(texts) - len(missing), len(missing))
+    return [vectors[h] for h in hashes]
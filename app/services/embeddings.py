@@ -0,0 +1,253 @@
+import asyncio
+import os
+import threading
+import time
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+from app import metrics
+from app.services.embedding_batcher import EMBEDDING_BATCH_ENABLED, QueryBatcher
+
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "intfloat/e5-large-v2")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "16"))
+EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "512"))
+# torch (fp32 sentence-transformers), onnx (ONNX Runtime fp32) or onnx-int8
+# (dynamically quantized weights). All produce vectors in the same space,
+# so switching does not require re-indexing.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Intra-op threads for inference; 0 keeps the library default (all cores).
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+# Where ONNX exports are kept; missing models are exported on first load.
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", os.path.join(".cache", "onnx"))
+
+_lock = threading.Lock()
+_model = None
+
+
+def onnx_model_path(quantized: bool) -> str:
+    name = EMBEDDING_MODEL_NAME.replace("/", "--")
+    return os.path.join(EMBEDDING_ONNX_DIR, name, "model-int8.onnx" if quantized else "model.onnx")
+
+
+def _write_atomically(path: str, write):
+    """Run ``write(tmp_path)`` and move the result to ``path`` once complete."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _export_fp32(path: str):
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME)
+    model = AutoModel.from_pretrained(EMBEDDING_MODEL_NAME).eval()
+    sample = tokenizer(["export"], return_tensors="pt")
+    axes = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": axes, "attention_mask": axes, "last_hidden_state": axes},
+            opset_version=14,
+        )
+
+
+def export_onnx(quantized: bool) -> str:
+    """Export the model to ONNX (and quantize it to int8) if not done yet.
+
+    The fp32 graph is exported from the transformers model with dynamic
+    batch and sequence axes; the int8 one is derived from it with ONNX
+    Runtime's dynamic quantization (int8 weights, activations quantized at
+    run time), which needs no calibration data.
+
+    Exports run under a file lock, so concurrent workers export once, and
+    are written to a temporary file renamed into place, so a crash never
+    leaves a partial model behind.
+    """
+    path = onnx_model_path(quantized)
+    if os.path.exists(path):
+        return path
+
+    from filelock import FileLock
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with FileLock(os.path.join(directory, "export.lock")):
+        if os.path.exists(path):
+            # Another worker finished the export while this one waited.
+            return path
+
+        fp32_path = onnx_model_path(False)
+        if not os.path.exists(fp32_path):
+            _write_atomically(fp32_path, _export_fp32)
+            print(f"Exported {EMBEDDING_MODEL_NAME} to {fp32_path}")
+
+        if quantized:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            _write_atomically(path, lambda tmp_path: quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8))
+            print(f"Quantized {fp32_path} to {path}")
+    return path
+
+
+class OnnxEmbeddings(Embeddings):
+    """The embedding model on ONNX Runtime, mean-pooled and normalized like
+    the sentence-transformers pipeline.
+
+    Texts are tokenized once, sorted by token length and batched, so each
+    batch is padded only to its own longest text instead of the longest of
+    the whole call.
+    """
+
+    def __init__(self, quantized: bool = False, threads: int = EMBEDDING_THREADS,
+                 batch_size: int = EMBEDDING_BATCH_SIZE, max_seq_length: int = EMBEDDING_MAX_SEQ_LENGTH):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            export_onnx(quantized), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME)
+        self.batch_size = batch_size
+        self.max_seq_length = max_seq_length
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        import numpy as np
+
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_seq_length)["input_ids"]
+        order = sorted(range(len(texts)), key=lambda i: len(encoded[i]))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            padded = self.tokenizer.pad({"input_ids": [encoded[i] for i in batch]}, return_tensors="np")
+            inputs = {
+                "input_ids": padded["input_ids"].astype(np.int64),
+                "attention_mask": padded["attention_mask"].astype(np.int64),
+            }
+            if "token_type_ids" in self.input_names:
+                inputs["token_type_ids"] = np.zeros_like(inputs["input_ids"])
+            hidden = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+
+            mask = inputs["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            metrics.observe("embeddings.batch_tokens", inputs["input_ids"].size,
+                            buckets=(256, 1024, 2048, 4096, 8192, 16384))
+            for i, vector in zip(batch, pooled):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts) if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+
+def _load_torch():
+    from langchain.embeddings import HuggingFaceEmbeddings
+
+    if EMBEDDING_THREADS:
+        import torch
+
+        torch.set_num_threads(EMBEDDING_THREADS)
+
+    model = HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={"device": EMBEDDING_DEVICE},
+        encode_kwargs={
+            "normalize_embeddings": True,
+            "batch_size": EMBEDDING_BATCH_SIZE,
+        },
+    )
+    model.client.max_seq_length = EMBEDDING_MAX_SEQ_LENGTH
+    return model
+
+
+BACKENDS = {
+    "torch": _load_torch,
+    "onnx": lambda: OnnxEmbeddings(quantized=False),
+    "onnx-int8": lambda: OnnxEmbeddings(quantized=True),
+}
+
+
+def load_model(backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    rss_before = metrics.rss_bytes()
+    start = time.perf_counter()
+
+    model = BACKENDS[backend]()
+
+    elapsed = time.perf_counter() - start
+    metrics.set_gauge("embeddings.load_seconds", elapsed)
+    metrics.set_gauge("embeddings.load_rss_bytes", metrics.rss_bytes() - rss_before)
+    print(f"Embedding model {EMBEDDING_MODEL_NAME} ({backend}) loaded on {EMBEDDING_DEVICE} in {elapsed:.2f}s")
+    return model
+
+
+def get_model():
+    """Return the process-wide embedding model, loading it on first use."""
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                _model = load_model()
+    return _model
+
+
+class SharedEmbeddings(Embeddings):
+    """Embeddings proxy that defers to the shared model.
+
+    Cheap to construct, so vector stores can be built at import time without
+    paying for the model load until the first embed call. Queries go through
+    the shared QueryBatcher, so concurrent requests share forward passes.
+    """
+
+    def __init__(self):
+        self.batcher = QueryBatcher(lambda texts: get_model().embed_documents(texts))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with metrics.timer("embeddings.embed_documents_seconds"):
+            return get_model().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with metrics.timer("embeddings.embed_query_seconds"):
+            return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries in one batched forward pass."""
+        with metrics.timer("embeddings.embed_queries_seconds"):
+            if EMBEDDING_BATCH_ENABLED:
+                return self.batcher.embed(texts)
+            return get_model().embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_queries([text]))[0]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        with metrics.timer("embeddings.embed_queries_seconds"):
+            if EMBEDDING_BATCH_ENABLED:
+                return await self.batcher.aembed(texts)
+            return await asyncio.get_running_loop().run_in_executor(None, get_model().embed_documents, texts)
+
+
+embeddings = SharedEmbeddings()
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Sequence
+
+from dotenv import load_dotenv
+from langchain.prompts import PromptTemplate
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, get_buffer_string
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app import metrics
+from app.cache import TTLCache
+from app.database import SessionLocal
+from app.models import ChatMessage, ChatSummary
+
+load_dotenv()
+
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "6"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_SUMMARY_ENABLED = os.getenv("HISTORY_SUMMARY_ENABLED", "true").lower() == "true"
+HISTORY_SUMMARY_MODEL = os.getenv("HISTORY_SUMMARY_MODEL", "gpt-3.5-turbo")
+# Messages folded into the summary per model call.
+HISTORY_SUMMARY_BATCH = int(os.getenv("HISTORY_SUMMARY_BATCH", "40"))
+
+SENDER_TYPES = {"user": HumanMessage, "ai": AIMessage}
+
+summary_prompt = PromptTemplate.from_template("""
+Progressively summarize the lines of conversation provided, adding onto the
+previous summary and returning a new summary. Keep the names, documents,
+figures and decisions a follow-up question could refer to, and write it in
+the language of the conversation.
+Current summary:
+{summary}
+New lines of conversation:
+{new_lines}
+New summary:
+""")
+
+_encoding = None
+_llm = None
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+_in_flight_lock = threading.Lock()
+_in_flight = set()
+# Last window start folded per session, so a full window does not trigger a
+# summary query on every turn.
+_folded_until = TTLCache(maxsize=10000, ttl=3600)
+
+
+def to_message(sender: str, content: str):
+    message_type = SENDER_TYPES.get(sender)
+    return message_type(content=content) if message_type and content else None
+
+
+def count_tokens(messages: Sequence[BaseMessage]) -> int:
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+
+        _encoding = tiktoken.encoding_for_model(HISTORY_SUMMARY_MODEL)
+    return len(_encoding.encode(get_buffer_string(messages)))
+
+
+def fit_budget(messages: List[BaseMessage], budget: int = HISTORY_TOKEN_BUDGET) -> List[BaseMessage]:
+    """Keep the newest messages whose rendered history fits ``budget`` tokens."""
+    kept = []
+    used = 0
+    for message in reversed(messages):
+        tokens = count_tokens([message])
+        if used + tokens > budget:
+            break
+        used += tokens
+        kept.append(message)
+    kept.reverse()
+    metrics.observe("history.window_tokens", used, buckets=(100, 250, 500, 1000, 1500, 2000, 4000, 8000))
+    metrics.observe("history.window_messages", len(kept), buckets=(0, 1, 2, 4, 6, 8, 12, 16, 24))
+    return kept
+
+
+def _get_llm():
+    global _llm
+    if _llm is None:
+        from langchain_openai import ChatOpenAI
+
+        _llm = ChatOpenAI(model=HISTORY_SUMMARY_MODEL, temperature=0)
+    return _llm
+
+
+def _refresh(session_id: str, before_id: int) -> int:
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        row = db.get(ChatSummary, session_id)
+        summary = row.summary if row else ""
+        covered = row.covered_until_id if row else 0
+        rows = db.execute(
+            select(ChatMessage.id, ChatMessage.sender, ChatMessage.content)
+            .where(
+                ChatMessage.session_id == session_id,
+                ChatMessage.id > covered,
+                ChatMessage.id < before_id,
+            )
+            .order_by(ChatMessage.id.asc())
+            .limit(HISTORY_SUMMARY_BATCH)
+        ).all()
+        if not rows:
+            return 0
+
+        messages = [m for m in (to_message(sender, content) for _, sender, content in rows) if m]
+        if messages:
+            summary = (summary_prompt | _get_llm()).invoke({
+                "summary": summary or "(empty)",
+                "new_lines": get_buffer_string(messages),
+            }).content.strip()
+
+        values = {"summary": summary, "covered_until_id": rows[-1].id, "updated_at": datetime.utcnow()}
+        db.execute(
+            insert(ChatSummary)
+            .values(session_id=session_id, **values)
+            .on_conflict_do_update(index_elements=[ChatSummary.session_id], set_=values)
+        )
+        db.commit()
+
+    metrics.inc("history.summary_updates")
+    metrics.observe("history.summary_seconds", time.perf_counter() - start)
+    return len(rows)
+
+
+def _run(session_id: str, before_id: int):
+    try:
+        while _refresh(session_id, before_id) == HISTORY_SUMMARY_BATCH:
+            pass
+        _folded_until.set(session_id, before_id)
+    except Exception as e:
+        metrics.inc("history.summary_failed")
+        print(f"History summary for session {session_id} failed:", e)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(session_id)
+
+
+def schedule_refresh(session_id: str, before_id: int):
+    """Fold messages older than ``before_id`` into the session summary.
+
+    Runs in the background, one update per session at a time; only messages
+    not yet covered by the stored summary go to the model.
+    """
+    if not HISTORY_SUMMARY_ENABLED or _folded_until.get(session_id) == before_id:
+        return
+    with _in_flight_lock:
+        if session_id in _in_flight:
+            return
+        _in_flight.add(session_id)
+    _executor.submit(_run, session_id, before_id)
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+from uuid import uuid4
+
+from dotenv import load_dotenv
+
+from app import metrics
+from app.services import session_events
+from app.services.pdf_indexer import process_and_index_pdf
+
+load_dotenv()
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_MAX_PENDING = int(os.getenv("INGESTION_MAX_PENDING", "16"))
+INGESTION_JOB_HISTORY = int(os.getenv("INGESTION_JOB_HISTORY", "500"))
+
+STAGES = ("parse", "chunk", "embed", "store")
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+class IngestionJob:
+    def __init__(self, session_id: str, user_id: int, filename: str, path: str,
+                 content_hash: Optional[str] = None):
+        self.id = str(uuid4())
+        self.session_id = session_id
+        self.user_id = user_id
+        self.filename = filename
+        self.path = path
+        self.content_hash = content_hash
+        self.status = "queued"
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.stages = {stage: {"status": "pending"} for stage in STAGES}
+
+    def update(self, stage: str, status: str, **info):
+        entry = self.stages.setdefault(stage, {"status": "pending"})
+        entry["status"] = status
+        entry.update(info)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "session_id": self.session_id,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stages": self.stages,
+        }
+
+
+_executor = ThreadPoolExecutor(max_workers=INGESTION_WORKERS, thread_name_prefix="ingest")
+_slots = threading.BoundedSemaphore(INGESTION_WORKERS + INGESTION_MAX_PENDING)
+_jobs_lock = threading.Lock()
+_jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+
+
+def _remember(job: IngestionJob):
+    with _jobs_lock:
+        _jobs[job.id] = job
+        while len(_jobs) > INGESTION_JOB_HISTORY:
+            oldest_id, oldest = next(iter(_jobs.items()))
+            if oldest.status in ("queued", "running"):
+                break
+            _jobs.pop(oldest_id)
+
+
+def _run(job: IngestionJob):
+    job.status = "running"
+    job.started_at = datetime.utcnow()
+    metrics.inc("ingestion.running")
+    start = time.perf_counter()
+    try:
+        process_and_index_pdf(job.session_id, job.path, progress=job.update, content_hash=job.content_hash)
+        job.status = "done"
+        metrics.inc("ingestion.jobs_done")
+        session_events.documents_changed(job.session_id)
+    except Exception as e:
+        print(f"Ingestion job {job.id} failed:", e)
+        job.status = "failed"
+        job.error = str(e)
+        metrics.inc("ingestion.jobs_failed")
+    finally:
+        job.finished_at = datetime.utcnow()
+        metrics.inc("ingestion.running", -1)
+        metrics.observe("ingestion.job_seconds", time.perf_counter() - start)
+        _slots.release()
+
+
+def submit(session_id: str, user_id: int, filename: str, path: str,
+           content_hash: Optional[str] = None) -> IngestionJob:
+    """Queue a PDF for indexing, raising IngestionQueueFull when saturated.
+
+    ``content_hash`` is the SHA-256 computed while the upload was written,
+    so the indexer does not read the file again to deduplicate it.
+    """
+    if not _slots.acquire(blocking=False):
+        metrics.inc("ingestion.rejected")
+        raise IngestionQueueFull("Too many uploads in progress, try again later")
+
+    job = IngestionJob(session_id, user_id, filename, path, content_hash)
+    _remember(job)
+    metrics.inc("ingestion.jobs_submitted")
+    try:
+        _executor.submit(_run, job)
+    except Exception:
+        _slots.release()
+        raise
+    return job
+
+
+def get_job(job_id: str) -> Optional[IngestionJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
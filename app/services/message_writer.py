@@ -0,0 +1,186 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import insert, update
+
+from app import metrics
+from app.database import SessionLocal
+from app.models import ChatMessage, ChatSession
+
+load_dotenv()
+
+MESSAGE_WRITE_BATCH_SIZE = int(os.getenv("MESSAGE_WRITE_BATCH_SIZE", "200"))
+MESSAGE_WRITE_MAX_WAIT_MS = float(os.getenv("MESSAGE_WRITE_MAX_WAIT_MS", "20"))
+MESSAGE_WRITE_MAX_PENDING = int(os.getenv("MESSAGE_WRITE_MAX_PENDING", "10000"))
+
+
+class MessageQueueFull(Exception):
+    pass
+
+
+class PendingMessage:
+    def __init__(self, session_id: str, sender: str, content: str, attachments: list, session_name: Optional[str]):
+        self.session_id = session_id
+        self.sender = sender
+        self.content = content
+        self.attachments = attachments
+        self.session_name = session_name
+        self.timestamp = datetime.utcnow()
+        self.future: Future = Future()
+
+    def row(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "sender": self.sender,
+            "content": self.content,
+            "timestamp": self.timestamp,
+            "attachments": self.attachments,
+        }
+
+
+_queue: "queue.Queue[PendingMessage]" = queue.Queue(maxsize=MESSAGE_WRITE_MAX_PENDING)
+_pending_lock = threading.Lock()
+_pending: Dict[str, List[PendingMessage]] = {}
+_thread_lock = threading.Lock()
+_thread = None
+
+
+def _ensure_thread():
+    global _thread
+    if _thread is None:
+        with _thread_lock:
+            if _thread is None:
+                _thread = threading.Thread(target=_run, name="message-writer", daemon=True)
+                _thread.start()
+
+
+def _next_batch() -> List[PendingMessage]:
+    batch = [_queue.get()]
+    deadline = time.monotonic() + MESSAGE_WRITE_MAX_WAIT_MS / 1000
+    while len(batch) < MESSAGE_WRITE_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        try:
+            batch.append(_queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _write(db, batch: List[PendingMessage]) -> List[int]:
+    ids = list(db.scalars(
+        insert(ChatMessage).returning(ChatMessage.id, sort_by_parameter_order=True),
+        [message.row() for message in batch],
+    ))
+    # Only the first user message of a session may rename it; the flag makes
+    # that a single conditional UPDATE instead of counting messages.
+    first_user = {}
+    for message in batch:
+        if message.sender == "user":
+            first_user.setdefault(message.session_id, message)
+    for session_id, message in first_user.items():
+        values = {"has_user_message": True}
+        if message.session_name:
+            values["name"] = message.session_name
+        db.execute(
+            update(ChatSession)
+            .where(ChatSession.session_id == session_id, ChatSession.has_user_message.is_(False))
+            .values(**values)
+        )
+    return ids
+
+
+def _flush(batch: List[PendingMessage]):
+    start = time.perf_counter()
+    results = {}
+    with SessionLocal() as db:
+        try:
+            results = dict(zip(batch, _write(db, batch)))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print("Batched message write failed, retrying one by one:", e)
+            for message in batch:
+                try:
+                    results[message] = _write(db, [message])[0]
+                    db.commit()
+                except Exception as row_error:
+                    db.rollback()
+                    results[message] = row_error
+                    metrics.inc("messages.write_failed")
+
+    with _pending_lock:
+        for message in batch:
+            session_pending = _pending.get(message.session_id)
+            if session_pending:
+                session_pending.remove(message)
+                if not session_pending:
+                    del _pending[message.session_id]
+
+    for message in batch:
+        result = results.get(message)
+        if isinstance(result, Exception):
+            print(f"Dropping message for session {message.session_id}:", result)
+            message.future.set_exception(result)
+        else:
+            message.future.set_result(result)
+
+    metrics.observe("messages.batch_size", len(batch), buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500))
+    metrics.observe("messages.flush_seconds", time.perf_counter() - start)
+    metrics.set_gauge("messages.queue_depth", _queue.qsize())
+
+
+def _run():
+    while True:
+        batch = _next_batch()
+        try:
+            _flush(batch)
+        except Exception as e:
+            print("Message writer error:", e)
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+def enqueue(
+    session_id: str,
+    sender: str,
+    content: str,
+    attachments: Optional[list] = None,
+    session_name: Optional[str] = None,
+) -> Future:
+    """Queue a chat message for a batched insert.
+
+    Messages are written by a single thread in enqueue order, so the order
+    within a session is preserved. ``session_name`` renames the session if
+    this turns out to be its first user message. The returned future
+    resolves to the new message id.
+    """
+    message = PendingMessage(session_id, sender, content, attachments or [], session_name)
+    _ensure_thread()
+    with _pending_lock:
+        try:
+            _queue.put_nowait(message)
+        except queue.Full:
+            metrics.inc("messages.rejected")
+            raise MessageQueueFull("Too many messages waiting to be saved, try again later")
+        _pending.setdefault(session_id, []).append(message)
+    metrics.inc("messages.enqueued")
+    return message.future
+
+
+def pending(session_id: str) -> List[PendingMessage]:
+    """Messages of a session that are queued but not yet committed."""
+    with _pending_lock:
+        return list(_pending.get(session_id, ()))
+
+
+def flush():
+    """Block until every queued message has been written."""
+    if _thread is not None:
+        _queue.join()
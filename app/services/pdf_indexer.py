@@ -1,56 +1,154 @@
 
 import os
-from langchain_community.document_loaders import UnstructuredPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores.pgvector import PGVector
-from langchain.embeddings import HuggingFaceEmbeddings
+import time
+from app.database import SessionLocal
+from app.models import IndexedFile
+from app.services.embedding_cache import embed_documents_cached, file_hash
+from app import metrics
+from app.services.chunker import StructuredChunker
+from app.services.pdf_parser import iter_pdf_elements
+from app.services.vector_store import copy_session_chunks
+from app.services.vector_writer import BulkVectorWriter
+
+# Number of chunks embedded and stored together while pages are still being parsed.
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "64"))
+
+
+def _report(progress, stage: str, status: str, **info):
+    if progress is not None:
+        progress(stage, status, **info)
+
+
+def _find_indexed(db, content_hash: str):
+    return (
+        db.query(IndexedFile)
+        .filter(IndexedFile.content_hash == content_hash)
+        .order_by(IndexedFile.indexed_at.desc())
+        .all()
+    )
+
+
+def _link_existing(db, session_id: str, path: str, content_hash: str, progress) -> bool:
+    """Reuse the chunks of a byte-identical PDF that was already indexed."""
+    indexed = _find_indexed(db, content_hash)
+    if any(entry.session_id == session_id for entry in indexed):
+        print(f"PDF {path} already indexed in session {session_id}")
+        for stage in ("parse", "chunk", "embed", "store"):
+            _report(progress, stage, "skipped", reason="already indexed")
+        return True
+
+    filename = os.path.basename(path)
+    for entry in indexed:
+        rows = copy_session_chunks(content_hash, entry.session_id, session_id, filename, path)
+        if rows:
+            db.add(IndexedFile(
+                content_hash=content_hash,
+                session_id=session_id,
+                filename=filename,
+                chunk_count=rows,
+            ))
+            db.commit()
+            print(f"Linked {rows} existing chunks from session {entry.session_id} to {session_id}")
+            for stage in ("parse", "chunk", "embed"):
+                _report(progress, stage, "skipped", reason="duplicate file")
+            _report(progress, "store", "done", rows=rows, linked_from=entry.session_id)
+            return True
+    return False
+
 
-def process_and_index_pdf(session_id: str, path: str):
+def process_and_index_pdf(session_id: str, path: str, progress=None, content_hash=None):
+    """Parse, chunk, embed and store a PDF as a streaming pipeline.
+
+    Pages are parsed in parallel and split as they arrive; every
+    INDEX_BATCH_SIZE chunks are embedded and handed to the bulk writer, so
+    embedding starts before parsing finishes and only one batch is held in
+    memory. All rows of the document are committed in a single transaction.
+
+    Chunk embeddings go through the content-addressed cache, and a PDF whose
+    bytes were already indexed in another session is linked instead of being
+    parsed again.
+
+    ``progress`` is an optional ``(stage, status, **info)`` callback for the
+    parse/chunk/embed/store stages.
+    """
     print(f"Processing PDF for session {session_id}: {path}")
-    
-    loader = UnstructuredPDFLoader(path)
-    docs = loader.load()
-    
-    
+    start_time = time.time()
+
+    if content_hash is None:
+        content_hash = file_hash(path)
+
+    db = SessionLocal()
+    try:
+        if _link_existing(db, session_id, path, content_hash, progress):
+            return
+    finally:
+        db.close()
+
     filename = os.path.basename(path)
+    chunker = StructuredChunker()
 
-    for i, doc in enumerate(docs):
-         doc.metadata["filename"] = filename
-         doc.metadata["session_id"] = session_id
-         doc.metadata["source"] = path
-         doc.metadata["page_number"] = i + 1
+    pages = set()
+    chunk_count = 0
+    batch = []
 
-    print(f"Uploaded documents: {len(docs)}")
+    with BulkVectorWriter() as writer:
 
+        def flush():
+            texts = [chunk.page_content for chunk in batch]
+            _report(progress, "embed", "running", embedded=chunk_count - len(batch))
+            vectors = embed_documents_cached(texts)
+            writer.add(texts, vectors, [chunk.metadata for chunk in batch])
+            _report(progress, "store", "running", rows=writer.rows_written)
+            batch.clear()
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=512, chunk_overlap=50)
-    chunks = text_splitter.split_documents(docs)
+        _report(progress, "parse", "running")
+        _report(progress, "chunk", "running")
 
-    print(f"Chunks generated: {len(chunks)}")
+        def elements():
+            for element in iter_pdf_elements(path):
+                if element.metadata["page_number"] not in pages:
+                    pages.add(element.metadata["page_number"])
+                    _report(progress, "parse", "running", pages=len(pages))
+                yield element
 
-    
-    for i, chunk in enumerate(chunks):
-        chunk.metadata["chunk_id"] = i
+        for chunk in chunker.split(elements()):
+            chunk.metadata["filename"] = filename
+            chunk.metadata["session_id"] = session_id
+            chunk.metadata["content_hash"] = content_hash
+            chunk.metadata["chunk_id"] = chunk_count
+            chunk_count += 1
+            batch.append(chunk)
+            _report(progress, "chunk", "running", chunks=chunk_count)
 
-    
-    embeddings = HuggingFaceEmbeddings(
-        model_name="intfloat/e5-large-v2",
-        encode_kwargs={"normalize_embeddings": True}
-    )
+            if len(batch) >= INDEX_BATCH_SIZE:
+                flush()
 
-    
-    postgres_url = os.getenv("POSTGRES_URL")
-    vector_store = PGVector(
-        collection_name="pdf_vectors_v3",
-        connection_string=postgres_url,
-        embedding_function=embeddings,
-        pre_delete_collection=False,
-        create_extension=False
-    )
+        avg_tokens = round(chunker.average_tokens, 1)
+        print(f"Pages parsed: {len(pages)}")
+        _report(progress, "parse", "done", pages=len(pages))
+        print(f"Chunks generated: {chunk_count} (avg {avg_tokens} tokens)")
+        _report(progress, "chunk", "done", chunks=chunk_count, avg_tokens=avg_tokens)
+        metrics.observe("chunker.chunks_per_document", chunk_count, buckets=(10, 50, 100, 250, 500, 1000, 5000))
+
+        if batch:
+            flush()
+        _report(progress, "embed", "done", embedded=chunk_count)
 
-    vector_store.add_documents(chunks)
+    stored = writer.rows_written
+    _report(progress, "store", "done", rows=stored)
+
+    db = SessionLocal()
+    try:
+        db.add(IndexedFile(
+            content_hash=content_hash,
+            session_id=session_id,
+            filename=filename,
+            chunk_count=stored,
+        ))
+        db.commit()
+    finally:
+        db.close()
     print(f"Vectorized PDF stored in session {session_id}")
-import time
-start_time = time.time()
-elapsed = time.time() - start_time
-print(f"⏱ Total execution time: {elapsed:.2f} seconds")
\ No newline at end of file
+
+    elapsed = time.time() - start_time
+    print(f"⏱ Total execution time: {elapsed:.2f} seconds")
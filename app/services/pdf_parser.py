@@ -0,0 +1,219 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+load_dotenv()
+
+PDF_PARSE_PROCESSES = int(os.getenv("PDF_PARSE_PROCESSES", "2"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+# Pages whose text layer is shorter than this are assumed to be scanned and
+# are re-parsed with Unstructured (OCR).
+PDF_MIN_TEXT_CHARS = int(os.getenv("PDF_MIN_TEXT_CHARS", "20"))
+# Detect ruled tables on text-layer pages with pdfplumber, so they become
+# Table elements; partition_text alone never produces them.
+PDF_DETECT_TABLES = os.getenv("PDF_DETECT_TABLES", "true").lower() == "true"
+
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn keeps the parser processes free of the torch model and the
+        # server's threads.
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_PARSE_PROCESSES,
+            mp_context=get_context("spawn"),
+        )
+    return _pool
+
+
+def page_count(path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+# Repeated page furniture that only adds noise to chunks.
+SKIPPED_CATEGORIES = {"Header", "Footer", "PageNumber", "PageBreak"}
+
+
+def _parse_page_unstructured(reader, index: int) -> List[Tuple[str, str]]:
+    from pypdf import PdfWriter
+    from langchain_community.document_loaders import UnstructuredPDFLoader
+
+    writer = PdfWriter()
+    writer.add_page(reader.pages[index])
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        writer.write(tmp)
+        tmp.flush()
+        docs = UnstructuredPDFLoader(tmp.name, mode="elements").load()
+    return [(doc.metadata.get("category", "Text"), doc.page_content) for doc in docs]
+
+
+def _partition_text(text: str) -> List[Tuple[str, str]]:
+    """Unstructured element types for a page of extracted text."""
+    from unstructured.cleaners.core import group_broken_paragraphs
+    from unstructured.partition.text import partition_text
+
+    try:
+        elements = partition_text(text=text, paragraph_grouper=group_broken_paragraphs)
+    except Exception as e:
+        print("Text partitioning failed, keeping the page as one element:", e)
+        return [("Text", text)]
+    return [(element.category, element.text) for element in elements]
+
+
+def format_table(rows: List[List[Optional[str]]]) -> str:
+    """One line per row, cells separated by " | ", empty rows dropped."""
+    lines = []
+    for row in rows:
+        cells = [" ".join((cell or "").split()) for cell in row]
+        if any(cells):
+            lines.append(" | ".join(cells))
+    return "\n".join(lines)
+
+
+def _partition_with_tables(page) -> Optional[List[Tuple[str, str]]]:
+    """Elements of a pdfplumber page with its tables as Table elements.
+
+    The text above, between and below the tables is partitioned as text, so
+    the elements stay in reading order. Returns None when the page has no
+    table.
+    """
+    tables = sorted(page.find_tables(), key=lambda table: table.bbox[1])
+    if not tables:
+        return None
+
+    left, top, right, bottom = page.bbox
+    elements = []
+
+    def add_text(upper: float, lower: float):
+        if lower - upper < 1:
+            return
+        text = page.crop((left, upper, right, lower)).extract_text() or ""
+        if text.strip():
+            elements.extend(_partition_text(text))
+
+    cursor = top
+    for table in tables:
+        table_top, table_bottom = max(table.bbox[1], top), min(table.bbox[3], bottom)
+        add_text(cursor, table_top)
+        text = format_table(table.extract())
+        if text:
+            elements.append(("Table", text))
+        cursor = max(cursor, table_bottom)
+    add_text(cursor, bottom)
+    return elements
+
+
+def parse_pages(path: str, first: int, last: int) -> List[Tuple[int, List[Tuple[str, str]], str]]:
+    """Parse pages ``first..last`` (0-based, exclusive end) of a PDF.
+
+    Returns ``(page_number, elements, parser)`` tuples with 1-based page
+    numbers, where elements are ``(category, text)`` pairs in reading order
+    using Unstructured's element types (Title, NarrativeText, ListItem,
+    Table, ...). The pypdf text layer is tried first: pages with ruled
+    tables are split around them with pdfplumber, the rest is partitioned
+    as text. Unstructured on the rendered page is the fallback.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    plumber = None
+    if PDF_DETECT_TABLES:
+        import pdfplumber
+
+        plumber = pdfplumber.open(path)
+
+    pages = []
+    try:
+        for index in range(first, last):
+            pages.append(_parse_page(path, reader, plumber, index))
+    finally:
+        if plumber is not None:
+            plumber.close()
+    return pages
+
+
+def _parse_page(path: str, reader, plumber, index: int) -> Tuple[int, List[Tuple[str, str]], str]:
+    text = reader.pages[index].extract_text() or ""
+    elements = None
+    parser = "text"
+    if len(text.strip()) < PDF_MIN_TEXT_CHARS:
+        try:
+            elements = _parse_page_unstructured(reader, index)
+            parser = "unstructured"
+        except Exception as e:
+            print(f"Unstructured fallback failed on page {index + 1} of {path}:", e)
+    elif plumber is not None:
+        try:
+            elements = _partition_with_tables(plumber.pages[index])
+        except Exception as e:
+            print(f"Table detection failed on page {index + 1} of {path}:", e)
+        if elements is not None:
+            parser = "tables"
+    if elements is None:
+        elements = _partition_text(text) if text.strip() else []
+    elements = [
+        (category, element_text)
+        for category, element_text in elements
+        if category not in SKIPPED_CATEGORIES and element_text.strip()
+    ]
+    return index + 1, elements, parser
+
+
+def iter_pdf_elements(path: str) -> Iterator[Document]:
+    """Yield one Document per element, in reading order, parsing ahead in parallel.
+
+    Only a bounded window of page batches is in flight at a time so memory
+    stays flat regardless of document length. With PDF_PARSE_PROCESSES=0 the
+    pages are parsed inline.
+    """
+    total = page_count(path)
+    ranges = [
+        (first, min(first + PDF_PAGES_PER_TASK, total))
+        for first in range(0, total, PDF_PAGES_PER_TASK)
+    ]
+
+    if PDF_PARSE_PROCESSES <= 0:
+        batches = (parse_pages(path, first, last) for first, last in ranges)
+    else:
+        batches = _iter_parallel(path, ranges)
+
+    for batch in batches:
+        for page_number, elements, parser in batch:
+            for category, text in elements:
+                yield Document(
+                    page_content=text,
+                    metadata={
+                        "source": path,
+                        "page_number": page_number,
+                        "parser": parser,
+                        "category": category,
+                    },
+                )
+
+
+def _iter_parallel(path: str, ranges):
+    pool = _get_pool()
+    window = PDF_PARSE_PROCESSES * 2
+    pending = []
+    ranges = iter(ranges)
+
+    for first, last in ranges:
+        pending.append(pool.submit(parse_pages, path, first, last))
+        if len(pending) >= window:
+            break
+
+    while pending:
+        future = pending.pop(0)
+        next_range = next(ranges, None)
+        if next_range is not None:
+            pending.append(pool.submit(parse_pages, path, *next_range))
+        yield future.result()
@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from typing import List, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from app import metrics
+from app.cache import TTLCache
+from app.services.embedding_cache import text_hash
+
+load_dotenv()
+
+# Small multilingual MS MARCO cross-encoder; runs on CPU in a few ms per pair.
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_DEVICE = os.getenv("RERANK_DEVICE", "cpu")
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "512"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+RERANK_CACHE_TTL = float(os.getenv("RERANK_CACHE_TTL", "3600"))
+
+_lock = threading.Lock()
+_model = None
+_scores = TTLCache(maxsize=RERANK_CACHE_SIZE, ttl=RERANK_CACHE_TTL)
+
+
+def get_model():
+    """Return the process-wide cross-encoder, loading it on first use."""
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                from sentence_transformers import CrossEncoder
+
+                start = time.perf_counter()
+                _model = CrossEncoder(RERANK_MODEL_NAME, device=RERANK_DEVICE, max_length=RERANK_MAX_LENGTH)
+                elapsed = time.perf_counter() - start
+                metrics.set_gauge("rerank.load_seconds", elapsed)
+                print(f"Rerank model {RERANK_MODEL_NAME} loaded on {RERANK_DEVICE} in {elapsed:.2f}s")
+    return _model
+
+
+def score(query: str, texts: List[str]) -> List[float]:
+    """Relevance of each text to ``query``, cached per (query, text) pair.
+
+    Only uncached pairs go through the model, in batches of
+    RERANK_BATCH_SIZE.
+    """
+    start = time.perf_counter()
+    query_key = text_hash(query)
+    keys = [(query_key, text_hash(text)) for text in texts]
+    scores = [_scores.get(key) for key in keys]
+    missing = [i for i, value in enumerate(scores) if value is None]
+
+    if missing:
+        predicted = get_model().predict(
+            [(query, texts[i]) for i in missing],
+            batch_size=RERANK_BATCH_SIZE,
+            show_progress_bar=False,
+        )
+        for i, value in zip(missing, predicted):
+            scores[i] = float(value)
+            _scores.set(keys[i], scores[i])
+
+    metrics.inc("rerank.cache_hits", len(texts) - len(missing))
+    metrics.inc("rerank.cache_misses", len(missing))
+    metrics.observe("rerank.seconds", time.perf_counter() - start)
+    metrics.observe("rerank.pairs", len(texts), buckets=(1, 5, 10, 20, 40, 80, 160))
+    return scores
+
+
+def rerank(query: str, docs: List[Document]) -> List[Tuple[Document, float]]:
+    """``docs`` ordered by cross-encoder score, best first."""
+    if not docs:
+        return []
+    scores = score(query, [doc.page_content for doc in docs])
+    return sorted(zip(docs, scores), key=lambda pair: pair[1], reverse=True)
@@ -0,0 +1,20 @@
+import threading
+
+_lock = threading.Lock()
+_listeners = []
+
+
+def subscribe(listener):
+    """Register ``listener(session_id)`` to run when a session's documents change."""
+    with _lock:
+        _listeners.append(listener)
+
+
+def documents_changed(session_id: str):
+    with _lock:
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(session_id)
+        except Exception as e:
+            print(f"Session listener failed for {session_id}:", e)
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import threading
+import time
+from typing import BinaryIO, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from app import metrics
+
+load_dotenv()
+
+# openai (Whisper API), local (transformers pipeline, needs ffmpeg) or stub.
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "openai")
+TRANSCRIPTION_MODEL = os.getenv("TRANSCRIPTION_MODEL", "whisper-1")
+TRANSCRIPTION_URL = os.getenv("TRANSCRIPTION_URL", "https://api.openai.com/v1/audio/transcriptions")
+TRANSCRIPTION_LOCAL_MODEL = os.getenv("TRANSCRIPTION_LOCAL_MODEL", "openai/whisper-base")
+TRANSCRIPTION_STUB_TEXT = os.getenv("TRANSCRIPTION_STUB_TEXT", "")
+TRANSCRIPTION_TIMEOUT = float(os.getenv("TRANSCRIPTION_TIMEOUT", "120"))
+TRANSCRIPTION_CONNECT_TIMEOUT = float(os.getenv("TRANSCRIPTION_CONNECT_TIMEOUT", "10"))
+TRANSCRIPTION_MAX_CONCURRENCY = int(os.getenv("TRANSCRIPTION_MAX_CONCURRENCY", "4"))
+# How long a request may wait for a free slot before being rejected.
+TRANSCRIPTION_QUEUE_TIMEOUT = float(os.getenv("TRANSCRIPTION_QUEUE_TIMEOUT", "10"))
+# The Whisper API rejects files above 25 MB.
+TRANSCRIPTION_MAX_BYTES = int(os.getenv("TRANSCRIPTION_MAX_BYTES", str(25 * 1024 * 1024)))
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+
+class TranscriptionError(Exception):
+    pass
+
+
+class TranscriptionBusy(TranscriptionError):
+    pass
+
+
+class TranscriptionTimeout(TranscriptionError):
+    def __init__(self, message: str, worker: Optional[asyncio.Future] = None):
+        super().__init__(message)
+        # Work that could not be cancelled and is still running, if any.
+        self.worker = worker
+
+
+class OpenAIWhisperBackend:
+    """Whisper API over one pooled async client, streaming the upload."""
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(TRANSCRIPTION_TIMEOUT, connect=TRANSCRIPTION_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=TRANSCRIPTION_MAX_CONCURRENCY,
+                    max_keepalive_connections=TRANSCRIPTION_MAX_CONCURRENCY,
+                ),
+                headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+            )
+        return self._client
+
+    async def transcribe(self, audio: BinaryIO, filename: str, content_type: str) -> str:
+        try:
+            response = await self._get_client().post(
+                TRANSCRIPTION_URL,
+                files={"file": (filename, audio, content_type)},
+                data={"model": TRANSCRIPTION_MODEL, "response_format": "text"},
+            )
+        except httpx.TimeoutException as e:
+            raise TranscriptionTimeout("Transcription timed out") from e
+        except httpx.HTTPError as e:
+            raise TranscriptionError(f"Transcription request failed: {e}") from e
+        if response.status_code != 200:
+            raise TranscriptionError(f"Transcription failed ({response.status_code}): {response.text}")
+        return response.text.strip()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class LocalWhisperBackend:
+    """Whisper through a local transformers pipeline, for offline use."""
+
+    def __init__(self):
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    def _transcribe(self, data: bytes) -> str:
+        with self._lock:
+            if self._pipeline is None:
+                from transformers import pipeline
+
+                self._pipeline = pipeline("automatic-speech-recognition", model=TRANSCRIPTION_LOCAL_MODEL)
+            return self._pipeline(data)["text"].strip()
+
+    async def transcribe(self, audio: BinaryIO, filename: str, content_type: str) -> str:
+        # Read here: the upload is closed once the request ends, which may be
+        # before a timed-out worker gets to it.
+        data = audio.read()
+        worker = asyncio.get_running_loop().run_in_executor(None, self._transcribe, data)
+        try:
+            # Shielded so the future stays pending until the thread is done.
+            return await asyncio.wait_for(asyncio.shield(worker), TRANSCRIPTION_TIMEOUT)
+        except asyncio.TimeoutError as e:
+            raise TranscriptionTimeout("Transcription timed out", worker) from e
+
+    async def aclose(self):
+        pass
+
+
+class StubBackend:
+    """Returns TRANSCRIPTION_STUB_TEXT, for tests and offline development."""
+
+    async def transcribe(self, audio: BinaryIO, filename: str, content_type: str) -> str:
+        return TRANSCRIPTION_STUB_TEXT
+
+    async def aclose(self):
+        pass
+
+
+BACKENDS = {
+    "openai": OpenAIWhisperBackend,
+    "local": LocalWhisperBackend,
+    "stub": StubBackend,
+}
+
+backend = BACKENDS[TRANSCRIPTION_BACKEND]()
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def _release_slot(worker: asyncio.Future):
+    if not worker.cancelled() and worker.exception() is not None:
+        print("Timed-out transcription failed:", worker.exception())
+    _slots.release()
+
+
+async def transcribe(audio: BinaryIO, filename: str, content_type: str) -> str:
+    """Transcribe one audio file, at most TRANSCRIPTION_MAX_CONCURRENCY at a time.
+
+    ``audio`` is read as it is sent, so the request's spooled upload is
+    streamed to the backend without another copy.
+    """
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(TRANSCRIPTION_MAX_CONCURRENCY)
+
+    try:
+        await asyncio.wait_for(_slots.acquire(), TRANSCRIPTION_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        metrics.inc("transcription.rejected")
+        raise TranscriptionBusy("Too many transcriptions in progress, try again later")
+
+    metrics.inc("transcription.in_flight")
+    start = time.perf_counter()
+    worker = None
+    try:
+        return await backend.transcribe(audio, filename, content_type)
+    except TranscriptionTimeout as e:
+        metrics.inc("transcription.failed")
+        worker = e.worker
+        raise
+    except TranscriptionError:
+        metrics.inc("transcription.failed")
+        raise
+    finally:
+        if worker is not None and not worker.done():
+            # A worker thread cannot be cancelled; it keeps its slot until it
+            # finishes, so timed-out work never exceeds the concurrency cap.
+            worker.add_done_callback(_release_slot)
+        else:
+            _slots.release()
+        metrics.inc("transcription.in_flight", -1)
+        metrics.observe("transcription.seconds", time.perf_counter() - start)
+
+
+async def aclose():
+    await backend.aclose()
@@ -0,0 +1,108 @@
+import hashlib
+import os
+from uuid import uuid4
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from app import metrics
+
+load_dotenv()
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+# Room for the multipart boundaries and the other form fields.
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimit:
+    """ASGI middleware capping the request body of uploads.
+
+    Requests whose Content-Length is over the limit are refused before the
+    body is read at all. Otherwise the body bytes are counted as they are
+    received, and the request fails with 413 as soon as it goes over, so
+    a body without a (truthful) Content-Length is not spooled in full
+    either. save_upload() then checks the size of the file itself.
+    """
+
+    def __init__(self, app, path: str, max_bytes: int = UPLOAD_MAX_BYTES):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.max_bytes + UPLOAD_FORM_OVERHEAD
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            metrics.inc("uploads.rejected_too_large")
+            response = JSONResponse({"detail": "File too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    metrics.inc("uploads.rejected_too_large")
+                    # Raised while the form is parsed; FastAPI passes an
+                    # HTTPException through, so the client gets the 413.
+                    raise HTTPException(status_code=413, detail="File too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _write_chunk(f, digest, chunk: bytes):
+    digest.update(chunk)
+    f.write(chunk)
+
+
+async def save_upload(file: UploadFile, path: str, max_bytes: int = UPLOAD_MAX_BYTES):
+    """Write an upload to ``path`` in fixed-size chunks, hashing as it goes.
+
+    Reads, writes and hashing run in the threadpool, so only one chunk per
+    upload is held in memory and the event loop is never blocked. The file
+    is written next to ``path`` and renamed into place once complete; going
+    over ``max_bytes`` removes it and raises UploadTooLarge.
+
+    Returns ``(size, sha256 hex digest)``.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    partial = f"{path}.{uuid4().hex}.part"
+    f = await run_in_threadpool(open, partial, "wb")
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                metrics.inc("uploads.rejected_too_large")
+                raise UploadTooLarge(f"File exceeds the {max_bytes // (1024 * 1024)} MB limit")
+            await run_in_threadpool(_write_chunk, f, digest, chunk)
+        await run_in_threadpool(f.close)
+        await run_in_threadpool(os.replace, partial, path)
+    except BaseException:
+        await run_in_threadpool(f.close)
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+    metrics.inc("uploads.bytes", size)
+    metrics.observe("uploads.size_bytes", size, buckets=(1e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8))
+    return size, digest.hexdigest()
@@ -0,0 +1,571 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_community.vectorstores.pgvector import PGVector
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from sqlalchemy import text
+
+from app import metrics
+from app.database import DATABASE_URL, async_engine, engine
+from app.services.embeddings import embeddings
+
+load_dotenv()
+
+COLLECTION_NAME = "pdf_vectors_v3"
+
+VECTOR_DIMENSION = int(os.getenv("VECTOR_DIMENSION", "1024"))
+# hnsw, ivfflat or none
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw")
+VECTOR_HNSW_M = int(os.getenv("VECTOR_HNSW_M", "16"))
+VECTOR_HNSW_EF_CONSTRUCTION = int(os.getenv("VECTOR_HNSW_EF_CONSTRUCTION", "64"))
+VECTOR_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "40"))
+VECTOR_IVFFLAT_LISTS = int(os.getenv("VECTOR_IVFFLAT_LISTS", "100"))
+VECTOR_IVFFLAT_PROBES = int(os.getenv("VECTOR_IVFFLAT_PROBES", "10"))
+# pgvector >= 0.8 can keep scanning the ANN index until enough rows pass the
+# session filter (off, relaxed_order or strict_order). Left empty, the
+# setting is not sent, so older servers keep working.
+VECTOR_ITERATIVE_SCAN = os.getenv("VECTOR_ITERATIVE_SCAN", "")
+VECTOR_SEARCH_WORKERS = int(os.getenv("VECTOR_SEARCH_WORKERS", "8"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Text search configuration of the lexical column; "simple" neither stems
+# nor drops words, so IDs, numbers and names match as written.
+LEXICAL_TS_CONFIG = os.getenv("LEXICAL_TS_CONFIG", "simple")
+# An exact lookup (quoted phrase or identifier such as ABC-123, v2.1 or
+# 4.2.1) matching at most this many chunks is answered lexically, without embedding the question.
+LEXICAL_SHORTCUT_MAX_HITS = int(os.getenv("LEXICAL_SHORTCUT_MAX_HITS", "3"))
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "de", "del", "does",
+    "el", "en", "es", "for", "how", "in", "is", "it", "la", "las", "los", "of",
+    "on", "or", "para", "por", "que", "qué", "se", "the", "to", "un", "una",
+    "what", "when", "where", "which", "who", "why", "y", "cómo", "cuál", "con",
+}
+# The generated columns are always created; this only controls the indexes.
+VECTOR_MANAGE_INDEXES = os.getenv("VECTOR_MANAGE_INDEXES", "true").lower() == "true"
+
+_lock = threading.Lock()
+_vector_store = None
+_search_executor = ThreadPoolExecutor(max_workers=VECTOR_SEARCH_WORKERS, thread_name_prefix="vsearch")
+
+
+def get_vector_store() -> PGVector:
+    """Return the shared PGVector store, connecting on first use."""
+    global _vector_store
+    if _vector_store is None:
+        with _lock:
+            if _vector_store is None:
+                store = PGVector(
+                    collection_name=COLLECTION_NAME,
+                    connection_string=DATABASE_URL.render_as_string(hide_password=False),
+                    embedding_function=embeddings,
+                    pre_delete_collection=False,
+                    create_extension=False,
+                    connection=engine,
+                )
+                timings = ensure_indexes(engine, indexes=VECTOR_MANAGE_INDEXES)
+                print(f"Vector columns and indexes ready ({sum(timings.values()):.2f}s)")
+                _load_collection_id()
+                _vector_store = store
+    return _vector_store
+
+
+def get_engine():
+    """Sync engine for vector access, once the collection tables exist."""
+    get_vector_store()
+    return engine
+
+
+def vector_literal(vector: List[float]) -> str:
+    return "[" + ",".join(repr(float(v)) for v in vector) + "]"
+
+
+def copy_session_chunks(content_hash: str, source_session_id: str, target_session_id: str,
+                        filename: str, path: str) -> int:
+    """Link an already indexed file to another session without re-embedding.
+
+    The stored rows of the source session are copied server-side with the
+    session metadata rewritten, so no parsing or inference is needed.
+    """
+    with get_engine().begin() as conn:
+        result = conn.execute(
+            text(
+                """
+                INSERT INTO langchain_pg_embedding
+                    (uuid, collection_id, embedding, document, cmetadata, custom_id)
+                SELECT gen_random_uuid(), e.collection_id, e.embedding, e.document,
+                       (e.cmetadata::jsonb || jsonb_build_object(
+                           'session_id', CAST(:target AS text),
+                           'filename', CAST(:filename AS text),
+                           'source', CAST(:path AS text)
+                       ))::json,
+                       gen_random_uuid()::text
+                FROM langchain_pg_embedding e
+                JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+                WHERE c.name = :collection
+                  AND e.cmetadata->>'session_id' = :source
+                  AND e.cmetadata->>'content_hash' = :content_hash
+                """
+            ),
+            {
+                "target": target_session_id,
+                "filename": filename,
+                "path": path,
+                "collection": COLLECTION_NAME,
+                "source": source_session_id,
+                "content_hash": content_hash,
+            },
+        )
+        return result.rowcount
+
+
+_collection_id = None
+
+
+def _index_ddl(index_type: str) -> list:
+    # langchain_pg_embedding.embedding has no fixed dimension, so the ANN
+    # index is built on a cast expression that search() repeats verbatim.
+    embedding = f"(embedding::vector({VECTOR_DIMENSION}))"
+    if index_type == "hnsw":
+        return [(
+            "ix_pdf_vectors_hnsw",
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pdf_vectors_hnsw ON langchain_pg_embedding "
+            f"USING hnsw ({embedding} vector_cosine_ops) "
+            f"WITH (m = {VECTOR_HNSW_M}, ef_construction = {VECTOR_HNSW_EF_CONSTRUCTION})",
+        )]
+    if index_type == "ivfflat":
+        return [(
+            "ix_pdf_vectors_ivfflat",
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pdf_vectors_ivfflat ON langchain_pg_embedding "
+            f"USING ivfflat ({embedding} vector_cosine_ops) WITH (lists = {VECTOR_IVFFLAT_LISTS})",
+        )]
+    return []
+
+
+_COLUMN_DDL = [
+    (
+        "session_id_column",
+        "ALTER TABLE langchain_pg_embedding ADD COLUMN IF NOT EXISTS session_id text "
+        "GENERATED ALWAYS AS (cmetadata->>'session_id') STORED",
+    ),
+    (
+        "document_tsv_column",
+        "ALTER TABLE langchain_pg_embedding ADD COLUMN IF NOT EXISTS document_tsv tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{LEXICAL_TS_CONFIG}'::regconfig, coalesce(document, ''))) STORED",
+    ),
+]
+
+_INDEX_DDL = [
+    (
+        "ix_pdf_vectors_session",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pdf_vectors_session "
+        "ON langchain_pg_embedding (collection_id, session_id)",
+    ),
+    (
+        "ix_pdf_vectors_tsv",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pdf_vectors_tsv ON langchain_pg_embedding USING gin (document_tsv)",
+    ),
+]
+
+_INVALID_INDEX_SQL = text(
+    """
+    SELECT NOT i.indisvalid
+    FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname = :name
+    """
+)
+
+
+def ensure_indexes(engine, index_type: str = VECTOR_INDEX_TYPE, indexes: bool = True) -> dict:
+    """Create the session and lexical columns and their indexes if missing.
+
+    ``session_id`` becomes a stored generated column over the JSON metadata,
+    so every insert path fills it, and is indexed together with the
+    collection. ``document_tsv`` is the generated full-text vector of the
+    chunk, with a GIN index. The columns are always created, since search
+    depends on them; ``indexes=False`` skips the indexes.
+
+    Indexes are built CONCURRENTLY so writes to the table are not blocked
+    while they build. An interrupted build leaves an invalid index that
+    IF NOT EXISTS would keep skipping, so such an index is dropped and
+    rebuilt. Returns the build time of each step in seconds.
+    """
+    statements = list(_COLUMN_DDL)
+    if indexes:
+        statements += _INDEX_DDL + _index_ddl(index_type)
+
+    timings = {}
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name, statement in statements:
+            start = time.perf_counter()
+            if conn.execute(_INVALID_INDEX_SQL, {"name": name}).scalar():
+                print(f"Dropping invalid index {name} left by an interrupted build")
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            conn.execute(text(statement))
+            timings[name] = time.perf_counter() - start
+            metrics.set_gauge(f"vector_index.{name}.build_seconds", timings[name])
+    return timings
+
+
+def _load_collection_id():
+    global _collection_id
+    with engine.connect() as conn:
+        _collection_id = conn.execute(
+            text("SELECT uuid FROM langchain_pg_collection WHERE name = :name"),
+            {"name": COLLECTION_NAME},
+        ).scalar()
+
+
+_SEARCH_SQL = text(
+    f"""
+    SELECT document, cmetadata,
+           (embedding::vector({VECTOR_DIMENSION})) <=> CAST(:query AS vector({VECTOR_DIMENSION})) AS distance
+    FROM langchain_pg_embedding
+    WHERE collection_id = :collection_id AND session_id = :session_id
+    ORDER BY distance
+    LIMIT :k
+    """
+)
+
+
+def _search_settings(exact: bool, ef_search: int, probes: int, k: int) -> list:
+    if exact:
+        return [text("SET LOCAL enable_indexscan = off")]
+    if VECTOR_INDEX_TYPE == "hnsw":
+        # HNSW returns at most ef_search candidates, before the session filter.
+        settings = [text(f"SET LOCAL hnsw.ef_search = {max(int(ef_search), int(k))}")]
+    elif VECTOR_INDEX_TYPE == "ivfflat":
+        settings = [text(f"SET LOCAL ivfflat.probes = {int(probes)}")]
+    else:
+        return []
+    if VECTOR_ITERATIVE_SCAN:
+        settings.append(text(f"SET LOCAL {VECTOR_INDEX_TYPE}.iterative_scan = {VECTOR_ITERATIVE_SCAN}"))
+    return settings
+
+
+def _search_params(session_id: str, query_vector: List[float], k: int) -> dict:
+    return {
+        "query": vector_literal(query_vector),
+        "collection_id": _collection_id,
+        "session_id": session_id,
+        "k": k,
+    }
+
+
+def _to_results(rows) -> List[Tuple[Document, float]]:
+    return [
+        (Document(page_content=row.document, metadata=row.cmetadata or {}), row.distance)
+        for row in rows
+    ]
+
+
+def search(session_id: str, query_vector: List[float], k: int = 4,
+           ef_search: int = VECTOR_EF_SEARCH, probes: int = VECTOR_IVFFLAT_PROBES,
+           exact: bool = False) -> List[Tuple[Document, float]]:
+    """Nearest chunks of one session by cosine distance.
+
+    The planner picks between the (collection_id, session_id) index and the
+    ANN index depending on how many rows the session has. The ANN index
+    covers every session and the session filter is applied to its
+    candidates, so for a small session it can return fewer than ``k`` rows;
+    the query is then repeated exactly, which for such a session is a cheap
+    scan of its rows through the session index. ``exact`` disables index
+    scans from the start, which is used to measure recall.
+    """
+    start = time.perf_counter()
+    params = _search_params(session_id, query_vector, k)
+    with get_engine().connect() as conn:
+        with conn.begin():
+            for statement in _search_settings(exact, ef_search, probes, k):
+                conn.execute(statement)
+            rows = conn.execute(_SEARCH_SQL, params).all()
+            if len(rows) < k and not exact:
+                metrics.inc("vector_search.exact_fallback")
+                for statement in _search_settings(True, ef_search, probes, k):
+                    conn.execute(statement)
+                rows = conn.execute(_SEARCH_SQL, params).all()
+    metrics.observe("vector_search.seconds", time.perf_counter() - start)
+    return _to_results(rows)
+
+
+async def asearch(session_id: str, query_vector: List[float], k: int = 4,
+                  ef_search: int = VECTOR_EF_SEARCH, probes: int = VECTOR_IVFFLAT_PROBES,
+                  exact: bool = False) -> List[Tuple[Document, float]]:
+    """Async variant of search() on the shared async engine."""
+    get_vector_store()
+    start = time.perf_counter()
+    params = _search_params(session_id, query_vector, k)
+    async with async_engine.connect() as conn:
+        async with conn.begin():
+            for statement in _search_settings(exact, ef_search, probes, k):
+                await conn.execute(statement)
+            rows = (await conn.execute(_SEARCH_SQL, params)).all()
+            if len(rows) < k and not exact:
+                metrics.inc("vector_search.exact_fallback")
+                for statement in _search_settings(True, ef_search, probes, k):
+                    await conn.execute(statement)
+                rows = (await conn.execute(_SEARCH_SQL, params)).all()
+    metrics.observe("vector_search.seconds", time.perf_counter() - start)
+    return _to_results(rows)
+
+
+def _document_key(doc: Document):
+    metadata = doc.metadata
+    return (metadata.get("filename"), metadata.get("chunk_id"), doc.page_content)
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int = RRF_K) -> List[Document]:
+    """Merge ranked lists, scoring each unique chunk by sum(1 / (k + rank))."""
+    scores = {}
+    docs = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = _document_key(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+def _missing_queries(queries: List[str], known_vectors: Optional[Dict[str, List[float]]]) -> List[str]:
+    return [query for query in dict.fromkeys(queries) if query not in (known_vectors or {})]
+
+
+def _vector_lists(session_id: str, queries: List[str], k: int,
+                  known_vectors: Optional[Dict[str, List[float]]] = None) -> List[List[Document]]:
+    vectors = dict(known_vectors or {})
+    missing = _missing_queries(queries, known_vectors)
+    if missing:
+        vectors.update(zip(missing, embeddings.embed_queries(missing)))
+    futures = [
+        _search_executor.submit(search, session_id, vectors[query], k)
+        for query in queries
+    ]
+    return [[doc for doc, _ in future.result()] for future in futures]
+
+
+async def _avector_lists(session_id: str, queries: List[str], k: int,
+                         known_vectors: Optional[Dict[str, List[float]]] = None) -> List[List[Document]]:
+    vectors = dict(known_vectors or {})
+    missing = _missing_queries(queries, known_vectors)
+    if missing:
+        vectors.update(zip(missing, await embeddings.aembed_queries(missing)))
+    results = await asyncio.gather(*(asearch(session_id, vectors[query], k) for query in queries))
+    return [[doc for doc, _ in result] for result in results]
+
+
+def search_many(session_id: str, queries: List[str], k: int = 4,
+                known_vectors: Optional[Dict[str, List[float]]] = None) -> List[Document]:
+    """Run several queries for one session and fuse the results.
+
+    All queries are embedded in a single batch and searched concurrently, so
+    latency follows the slowest query rather than the sum of all of them.
+    Queries found in ``known_vectors`` (e.g. a question already embedded for
+    the semantic cache) are not embedded again.
+    """
+    start = time.perf_counter()
+    result_lists = _vector_lists(session_id, queries, k, known_vectors)
+    metrics.observe("vector_search.fanout_seconds", time.perf_counter() - start)
+    return reciprocal_rank_fusion(result_lists)
+
+
+async def asearch_many(session_id: str, queries: List[str], k: int = 4,
+                       known_vectors: Optional[Dict[str, List[float]]] = None) -> List[Document]:
+    start = time.perf_counter()
+    result_lists = await _avector_lists(session_id, queries, k, known_vectors)
+    metrics.observe("vector_search.fanout_seconds", time.perf_counter() - start)
+    return reciprocal_rank_fusion(result_lists)
+
+
+# ts_rank_cd normalization 1 divides by 1 + log(length), so long chunks do
+# not win on term frequency alone (the length part of BM25; there is no IDF).
+_LEXICAL_SQL = text(
+    """
+    SELECT document, cmetadata, ts_rank_cd(document_tsv, query, 1) AS rank
+    FROM langchain_pg_embedding, to_tsquery(CAST(:ts_config AS regconfig), :query) AS query
+    WHERE collection_id = :collection_id AND session_id = :session_id
+      AND document_tsv @@ query
+    ORDER BY rank DESC
+    LIMIT :k
+    """
+)
+
+_QUOTED_OR_WORD = re.compile(r'"([^"]+)"|(\w+(?:[-./]\w+)*)')
+
+
+def lexical_terms(query: str) -> List[str]:
+    return [
+        word for word in dict.fromkeys(re.findall(r"\w+", query.lower()))
+        if word not in STOPWORDS and len(word) > 1
+    ]
+
+
+def is_identifier(term: str) -> bool:
+    """A term with digits mixed with letters or split by punctuation.
+
+    ABC-123, v2.1 and 4.2.1 qualify; plain numbers such as years, counts or
+    page numbers do not, and neither do hyphenated words.
+    """
+    if not any(c.isdigit() for c in term):
+        return False
+    return any(c.isalpha() for c in term) or any(c in "-./" for c in term)
+
+
+def exact_terms(query: str) -> List[str]:
+    """Quoted phrases and identifier-like terms (clause numbers, invoice IDs)."""
+    terms = []
+    for quoted, word in _QUOTED_OR_WORD.findall(query):
+        if quoted.strip():
+            terms.append(quoted.strip())
+        elif word and is_identifier(word):
+            terms.append(word)
+    return terms
+
+
+def _lexical_statement(query: str) -> Optional[Tuple[text, dict]]:
+    terms = lexical_terms(query)
+    if not terms:
+        return None
+    return _LEXICAL_SQL, {"query": " | ".join(terms)}
+
+
+def _exact_statement(query: str) -> Optional[Tuple[text, dict]]:
+    terms = exact_terms(query)
+    if not terms:
+        return None
+    phrases = " && ".join(
+        f"phraseto_tsquery(CAST(:ts_config AS regconfig), :term_{i})" for i in range(len(terms))
+    )
+    statement = text(
+        f"""
+        SELECT document, cmetadata, ts_rank_cd(document_tsv, query, 1) AS rank
+        FROM langchain_pg_embedding, ({phrases}) AS query
+        WHERE collection_id = :collection_id AND session_id = :session_id
+          AND document_tsv @@ query
+        ORDER BY rank DESC
+        LIMIT :k
+        """
+    )
+    return statement, {f"term_{i}": term for i, term in enumerate(terms)}
+
+
+def _lexical_params(session_id: str, params: dict, k: int) -> dict:
+    return {
+        **params,
+        "ts_config": LEXICAL_TS_CONFIG,
+        "collection_id": _collection_id,
+        "session_id": session_id,
+        "k": k,
+    }
+
+
+def _to_docs(rows) -> List[Document]:
+    return [Document(page_content=row.document, metadata=row.cmetadata or {}) for row in rows]
+
+
+def _run_lexical(statement, session_id: str, k: int) -> List[Document]:
+    if statement is None:
+        return []
+    sql, params = statement
+    start = time.perf_counter()
+    with get_engine().connect() as conn:
+        rows = conn.execute(sql, _lexical_params(session_id, params, k)).all()
+    metrics.observe("lexical_search.seconds", time.perf_counter() - start)
+    return _to_docs(rows)
+
+
+async def _arun_lexical(statement, session_id: str, k: int) -> List[Document]:
+    if statement is None:
+        return []
+    get_vector_store()
+    sql, params = statement
+    start = time.perf_counter()
+    async with async_engine.connect() as conn:
+        rows = (await conn.execute(sql, _lexical_params(session_id, params, k))).all()
+    metrics.observe("lexical_search.seconds", time.perf_counter() - start)
+    return _to_docs(rows)
+
+
+def lexical_search(session_id: str, query: str, k: int = 4) -> List[Document]:
+    """Chunks of one session matching any query term, best ts_rank_cd first."""
+    return _run_lexical(_lexical_statement(query), session_id, k)
+
+
+def exact_match(session_id: str, query: str) -> Optional[List[Document]]:
+    """Chunks containing every exact term of ``query``, if that is decisive.
+
+    Returns None unless the query has exact terms and they match between 1
+    and LEXICAL_SHORTCUT_MAX_HITS chunks.
+    """
+    docs = _run_lexical(_exact_statement(query), session_id, LEXICAL_SHORTCUT_MAX_HITS + 1)
+    return docs if 0 < len(docs) <= LEXICAL_SHORTCUT_MAX_HITS else None
+
+
+def hybrid_search_many(session_id: str, queries: List[str], k: int = 4,
+                       known_vectors: Optional[Dict[str, List[float]]] = None) -> List[Document]:
+    """Fuse the vector and lexical results of every query with RRF."""
+    start = time.perf_counter()
+    lexical = [_search_executor.submit(lexical_search, session_id, query, k) for query in queries]
+    result_lists = _vector_lists(session_id, queries, k, known_vectors) + [future.result() for future in lexical]
+    metrics.observe("hybrid_search.seconds", time.perf_counter() - start)
+    return reciprocal_rank_fusion(result_lists)
+
+
+async def ahybrid_search_many(session_id: str, queries: List[str], k: int = 4,
+                              known_vectors: Optional[Dict[str, List[float]]] = None) -> List[Document]:
+    start = time.perf_counter()
+    vector_lists, *lexical_lists = await asyncio.gather(
+        _avector_lists(session_id, queries, k, known_vectors),
+        *(_arun_lexical(_lexical_statement(query), session_id, k) for query in queries),
+    )
+    metrics.observe("hybrid_search.seconds", time.perf_counter() - start)
+    return reciprocal_rank_fusion(vector_lists + lexical_lists)
+
+
+class SessionVectorRetriever(BaseRetriever):
+    """Vector retriever scoped to the chunks of one chat session."""
+
+    session_id: str
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        vector = embeddings.embed_query(query)
+        return [doc for doc, _ in search(self.session_id, vector, k=self.k)]
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return await asearch_many(self.session_id, [query], k=self.k)
+
+    def get_many(self, queries: List[str],
+                 known_vectors: Optional[Dict[str, List[float]]] = None) -> List[Document]:
+        return search_many(self.session_id, queries, k=self.k, known_vectors=known_vectors)
+
+    async def aget_many(self, queries: List[str],
+                        known_vectors: Optional[Dict[str, List[float]]] = None) -> List[Document]:
+        return await asearch_many(self.session_id, queries, k=self.k, known_vectors=known_vectors)
+
+
+class SessionHybridRetriever(SessionVectorRetriever):
+    """Session retriever fusing full-text and vector search results."""
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return hybrid_search_many(self.session_id, [query], k=self.k)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        return await ahybrid_search_many(self.session_id, [query], k=self.k)
+
+    def get_many(self, queries: List[str],
+                 known_vectors: Optional[Dict[str, List[float]]] = None) -> List[Document]:
+        return hybrid_search_many(self.session_id, queries, k=self.k, known_vectors=known_vectors)
+
+    async def aget_many(self, queries: List[str],
+                        known_vectors: Optional[Dict[str, List[float]]] = None) -> List[Document]:
+        return await ahybrid_search_many(self.session_id, queries, k=self.k, known_vectors=known_vectors)
@@ -0,0 +1,136 @@
+import io
+import json
+import os
+import time
+import uuid
+from typing import List
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+from app import metrics
+from app.services.vector_store import COLLECTION_NAME, get_engine, vector_literal
+
+load_dotenv()
+
+VECTOR_WRITE_BATCH_SIZE = int(os.getenv("VECTOR_WRITE_BATCH_SIZE", "500"))
+# "copy" streams rows with COPY FROM STDIN, "insert" uses multi-row INSERTs.
+VECTOR_WRITE_METHOD = os.getenv("VECTOR_WRITE_METHOD", "copy")
+
+_COLUMNS = "(uuid, collection_id, embedding, document, cmetadata, custom_id)"
+
+
+def _copy_escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class BulkVectorWriter:
+    """Write chunk embeddings to the pdf_vectors_v3 collection in bulk.
+
+    Rows are buffered and flushed every ``batch_size`` rows with COPY or
+    multi-row INSERTs, all inside one transaction that is committed when the
+    ``with`` block exits cleanly and rolled back otherwise, so a document is
+    either fully stored or not at all.
+    """
+
+    def __init__(self, batch_size: int = VECTOR_WRITE_BATCH_SIZE, method: str = VECTOR_WRITE_METHOD):
+        if method not in ("copy", "insert"):
+            raise ValueError(f"Unknown vector write method: {method}")
+        self.batch_size = batch_size
+        self.method = method
+        self.rows_written = 0
+        self._rows = []
+        self._conn = None
+        self._trans = None
+        self._collection_id = None
+
+    def __enter__(self):
+        self._conn = get_engine().connect()
+        self._trans = self._conn.begin()
+        self._collection_id = self._conn.execute(
+            text("SELECT uuid FROM langchain_pg_collection WHERE name = :name"),
+            {"name": COLLECTION_NAME},
+        ).scalar()
+        if self._collection_id is None:
+            self._trans.rollback()
+            self._conn.close()
+            raise ValueError("Collection not found")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+                self._trans.commit()
+            else:
+                self._trans.rollback()
+        finally:
+            self._conn.close()
+        return False
+
+    def add(self, texts: List[str], vectors: List[List[float]], metadatas: List[dict]):
+        for doc, vector, metadata in zip(texts, vectors, metadatas):
+            self._rows.append((
+                str(uuid.uuid4()),
+                str(self._collection_id),
+                vector_literal(vector),
+                doc,
+                json.dumps(metadata),
+                str(uuid.uuid4()),
+            ))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        start = time.perf_counter()
+        if self.method == "copy":
+            self._copy(self._rows)
+        else:
+            self._insert(self._rows)
+        elapsed = time.perf_counter() - start
+        metrics.observe("vector_writer.flush_seconds", elapsed)
+        metrics.inc("vector_writer.rows", len(self._rows))
+        self.rows_written += len(self._rows)
+        self._rows = []
+
+    def _copy(self, rows):
+        sql = f"COPY langchain_pg_embedding {_COLUMNS} FROM STDIN"
+        cursor = self._conn.connection.driver_connection.cursor()
+        try:
+            if hasattr(cursor, "copy"):
+                # psycopg 3
+                with cursor.copy(sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                # psycopg2
+                buffer = io.StringIO()
+                for row in rows:
+                    buffer.write("\t".join(_copy_escape(value) for value in row))
+                    buffer.write("\n")
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+        finally:
+            cursor.close()
+
+    def _insert(self, rows):
+        values = []
+        params = {}
+        for i, row in enumerate(rows):
+            values.append(
+                f"(CAST(:u{i} AS uuid), CAST(:c{i} AS uuid), CAST(:e{i} AS vector), "
+                f":d{i}, CAST(:m{i} AS json), :x{i})"
+            )
+            for key, value in zip("ucedmx", row):
+                params[f"{key}{i}"] = value
+        self._conn.execute(
+            text(f"INSERT INTO langchain_pg_embedding {_COLUMNS} VALUES " + ", ".join(values)),
+            params,
+        )
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from app import metrics
+
+load_dotenv()
+
+# eager: warm everything up before serving; background: serve at once and
+# warm up in a thread; lazy: only prepare the schema, the rest loads on first use.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+STARTUP_MODES = ("eager", "background", "lazy")
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+
+_started = time.perf_counter()
+_lock = threading.Lock()
+_phases: "OrderedDict[str, float]" = OrderedDict()
+_components: "OrderedDict[str, dict]" = OrderedDict()
+_warmups = []
+
+
+@contextmanager
+def phase(name: str):
+    """Time one step of the startup (an import, a warm-up task)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _phases[name] = elapsed
+        metrics.set_gauge(f"startup.{name}_seconds", elapsed)
+
+
+def register(name: str, func, required: bool = True):
+    """Add a warm-up task; only ``required`` ones gate readiness.
+
+    Optional tasks load shared resources early so the first request does not
+    pay for them; in lazy mode they are skipped and load on first use.
+    """
+    _warmups.append((name, func, required))
+    _components[name] = {"status": "pending", "required": required}
+
+
+def _run(name: str, func) -> bool:
+    _components[name]["status"] = "running"
+    try:
+        with phase(f"warmup.{name}"):
+            func()
+        _components[name].update(status="ready", error=None)
+        return True
+    except Exception as e:
+        print(f"Warm-up of {name} failed:", e)
+        _components[name].update(status="failed", error=str(e))
+        return False
+
+
+def _warm_up(lazy: bool, retry: bool):
+    for name, func, required in _warmups:
+        if lazy and not required:
+            _components[name]["status"] = "lazy"
+            continue
+        # Required tasks (the schema) are retried until the database is up,
+        # the process stays live but not ready meanwhile.
+        while not _run(name, func) and required and retry:
+            time.sleep(STARTUP_RETRY_SECONDS)
+    metrics.set_gauge("startup.ready_seconds", time.perf_counter() - _started)
+    print(f"Startup ({STARTUP_MODE}) finished in {time.perf_counter() - _started:.2f}s")
+
+
+def start():
+    with _lock:
+        imports = [(name, seconds) for name, seconds in _phases.items() if name.startswith("import.")]
+    print("Import times: " + ", ".join(f"{name[len('import.'):]} {seconds:.2f}s" for name, seconds in imports))
+    mode = STARTUP_MODE if STARTUP_MODE in STARTUP_MODES else "background"
+    if mode == "eager":
+        _warm_up(lazy=False, retry=False)
+    else:
+        threading.Thread(target=_warm_up, args=(mode == "lazy", True), name="warm-up", daemon=True).start()
+
+
+def is_ready() -> bool:
+    return all(
+        component["status"] == "ready"
+        for component in _components.values()
+        if component["required"]
+    )
+
+
+def report() -> dict:
+    with _lock:
+        phases = dict(_phases)
+    return {
+        "mode": STARTUP_MODE,
+        "ready": is_ready(),
+        "uptime_seconds": time.perf_counter() - _started,
+        "components": {name: dict(component) for name, component in _components.items()},
+        "phases": phases,
+    }
@@ -0,0 +1,49 @@
+"""Per-request authentication latency with a cold and a warm user cache.
+
+Usage: python -m benchmarks.bench_auth <email> [requests]
+
+"cold" clears the cache before every call, which is the database lookup
+every request paid before; "warm" is the common path with a cached user.
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from sqlalchemy import select
+
+from app.auth import utils
+from app.database import AsyncSessionLocal
+from app.models import User
+
+
+async def measure(token: str, count: int, cold: bool):
+    latencies = []
+    for _ in range(count):
+        if cold:
+            utils._user_cache.clear()
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            user = await utils.get_user_from_token(token, db)
+            latencies.append(time.perf_counter() - start)
+        assert user is not None
+    return latencies
+
+
+async def main(email: str, count: int):
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(select(User).where(User.email == email))
+    if user is None:
+        raise SystemExit(f"No user with email {email}")
+    token = utils.create_access_token(data=utils.token_claims(user))
+
+    for label, cold in (("cold", True), ("warm", False)):
+        latencies = await measure(token, count, cold)
+        print(
+            f"{label}  p50={statistics.median(latencies) * 1000:.2f}ms "
+            f"max={max(latencies) * 1000:.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 200))
@@ -0,0 +1,67 @@
+"""Throughput and retrieval drift of the embedding backends against fp32 torch.
+
+Usage: python -m benchmarks.bench_embeddings [backends] [repeat] [k]
+
+backends is a comma-separated list (default "onnx,onnx-int8"). The texts
+and queries of benchmarks/fixtures/hybrid_corpus.json are embedded by
+every backend; the corpus is repeated ``repeat`` times for throughput.
+Drift is reported as the cosine similarity to the fp32 vectors and as the
+overlap of each query's top-k chunks with the fp32 top-k, both with the
+corpus embedded by the same backend and with the fp32 corpus (queries
+embedded by a new backend against an index built before switching).
+"""
+import json
+import sys
+import time
+
+import numpy as np
+
+from app.services.embeddings import load_model
+from benchmarks.bench_hybrid_search import DEFAULT_CORPUS
+
+
+def embed(model, texts, queries, repeat: int):
+    model.embed_documents(texts[:2])  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        docs = model.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    query_vectors = [model.embed_query(query) for query in queries]
+    query_seconds = (time.perf_counter() - start) / len(queries)
+    return np.array(docs), np.array(query_vectors), len(texts) * repeat / elapsed, query_seconds
+
+
+def top_k(queries, docs, k: int):
+    return np.argsort(-(queries @ docs.T), axis=1)[:, :k]
+
+
+def overlap(found, truth) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+if __name__ == "__main__":
+    backends = sys.argv[1].split(",") if len(sys.argv) > 1 else ["onnx", "onnx-int8"]
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    with open(DEFAULT_CORPUS) as f:
+        corpus = json.load(f)
+    texts = [chunk["text"] for chunk in corpus["chunks"]]
+    queries = [item["query"] for item in corpus["queries"]]
+
+    base_docs, base_queries, base_rate, base_query = embed(load_model("torch"), texts, queries, repeat)
+    truth = top_k(base_queries, base_docs, k)
+    print(f"{'torch':<10} {base_rate:8.1f} texts/s  query={base_query * 1000:6.1f}ms")
+
+    for backend in backends:
+        docs, query_vectors, rate, query_seconds = embed(load_model(backend), texts, queries, repeat)
+        cosine = np.sum(docs * base_docs, axis=1)
+        print(
+            f"{backend:<10} {rate:8.1f} texts/s  query={query_seconds * 1000:6.1f}ms  "
+            f"speedup={rate / base_rate:.2f}x  "
+            f"cosine mean={cosine.mean():.4f} min={cosine.min():.4f}  "
+            f"top{k} overlap={overlap(top_k(query_vectors, docs, k), truth):.3f} "
+            f"vs fp32 index={overlap(top_k(query_vectors, base_docs, k), truth):.3f}"
+        )
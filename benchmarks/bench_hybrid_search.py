@@ -0,0 +1,93 @@
+"""Recall and latency of vector-only, hybrid and shortcut retrieval.
+
+Usage: python -m benchmarks.bench_hybrid_search [k] [corpus.json]
+
+The fixture corpus (benchmarks/fixtures/hybrid_corpus.json by default) is
+embedded and written under a throwaway session_id, every query is run in
+each mode and recall@k is measured against the chunk ids it expects. The
+rows are deleted afterwards.
+"""
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+from app.services.embeddings import embeddings
+from app.services.vector_store import (
+    ensure_indexes,
+    exact_match,
+    get_engine,
+    hybrid_search_many,
+    search_many,
+)
+from app.services.vector_writer import BulkVectorWriter
+from benchmarks.bench_vector_writer import cleanup
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "fixtures", "hybrid_corpus.json")
+
+
+def load_corpus(path: str, session_id: str):
+    with open(path) as f:
+        corpus = json.load(f)
+    chunks = corpus["chunks"]
+    texts = [chunk["text"] for chunk in chunks]
+    metadatas = [
+        {
+            "session_id": session_id,
+            "chunk_id": chunk["chunk_id"],
+            "filename": chunk["filename"],
+            "page_number": chunk["page_number"],
+        }
+        for chunk in chunks
+    ]
+    with BulkVectorWriter() as writer:
+        writer.add(texts, embeddings.embed_documents(texts), metadatas)
+    return corpus["queries"]
+
+
+def shortcut_search(session_id: str, queries, k: int):
+    docs = exact_match(session_id, queries[0])
+    return docs if docs is not None else hybrid_search_many(session_id, queries, k=k)
+
+
+def run(session_id: str, queries, k: int, retrieve):
+    latencies = []
+    hits = 0
+    total = 0
+    for item in queries:
+        start = time.perf_counter()
+        docs = retrieve(session_id, [item["query"]], k)[:k]
+        latencies.append(time.perf_counter() - start)
+        found = {doc.metadata.get("chunk_id") for doc in docs}
+        hits += len(found & set(item["expected"]))
+        total += len(item["expected"])
+    return hits / total if total else 1.0, latencies
+
+
+if __name__ == "__main__":
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CORPUS
+
+    ensure_indexes(get_engine())
+    session_id = f"bench-{uuid.uuid4()}"
+    try:
+        queries = load_corpus(path, session_id)
+        # Load the model and warm the connection pool before timing.
+        search_many(session_id, [queries[0]["query"]], k=k)
+
+        modes = [
+            ("vector", lambda s, q, k: search_many(s, q, k=k)),
+            ("hybrid", lambda s, q, k: hybrid_search_many(s, q, k=k)),
+            ("hybrid+shortcut", shortcut_search),
+        ]
+        for name, retrieve in modes:
+            recall, latencies = run(session_id, queries, k, retrieve)
+            print(
+                f"{name:<16} recall@{k}={recall:.3f} "
+                f"p50={statistics.median(latencies) * 1000:.1f}ms "
+                f"max={max(latencies) * 1000:.1f}ms"
+            )
+    finally:
+        cleanup(session_id)
@@ -0,0 +1,75 @@
+"""Recall and latency of session vector search for several ef_search/probes values.
+
+Usage: python -m benchmarks.bench_vector_search <session_id> [queries] [k]
+
+Stored chunks of the session are used as queries; exact search (index scans
+disabled) is the ground truth for recall@k.
+"""
+import statistics
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.services.vector_store import (
+    VECTOR_INDEX_TYPE,
+    ensure_indexes,
+    get_engine,
+    search,
+)
+
+
+def sample_queries(session_id: str, count: int):
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT embedding::text FROM langchain_pg_embedding "
+                "WHERE session_id = :session_id ORDER BY random() LIMIT :count"
+            ),
+            {"session_id": session_id, "count": count},
+        ).all()
+    return [[float(v) for v in row[0].strip("[]").split(",")] for row in rows]
+
+
+def run(session_id: str, queries, k: int, **kwargs):
+    latencies = []
+    results = []
+    for vector in queries:
+        start = time.perf_counter()
+        docs = search(session_id, vector, k=k, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        results.append([doc.page_content for doc, _ in docs])
+    return results, latencies
+
+
+def recall(truth, found) -> float:
+    hits = sum(len(set(t) & set(f)) for t, f in zip(truth, found))
+    total = sum(len(t) for t in truth)
+    return hits / total if total else 1.0
+
+
+if __name__ == "__main__":
+    session_id = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    timings = ensure_indexes(get_engine())
+    for name, seconds in timings.items():
+        print(f"build {name:<28} {seconds:.2f}s")
+
+    queries = sample_queries(session_id, count)
+    truth, exact_latencies = run(session_id, queries, k, exact=True)
+    print(f"exact            recall=1.000 p50={statistics.median(exact_latencies) * 1000:.1f}ms")
+
+    if VECTOR_INDEX_TYPE == "ivfflat":
+        settings = [{"probes": p} for p in (1, 5, 10, 20, 50)]
+    else:
+        settings = [{"ef_search": ef} for ef in (10, 20, 40, 80, 160)]
+
+    for setting in settings:
+        found, latencies = run(session_id, queries, k, **setting)
+        label = ", ".join(f"{key}={value}" for key, value in setting.items())
+        print(
+            f"{label:<16} recall={recall(truth, found):.3f} "
+            f"p50={statistics.median(latencies) * 1000:.1f}ms"
+        )
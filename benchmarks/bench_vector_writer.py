@@ -0,0 +1,70 @@
+"""Compare rows/s of PGVector.add_embeddings against the bulk vector writer.
+
+Usage: python -m benchmarks.bench_vector_writer [rows] [dimension]
+
+Writes synthetic rows tagged with a throwaway session_id into the
+pdf_vectors_v3 collection of SQLALCHEMY_DATABASE_URL and deletes them afterwards.
+"""
+import random
+import sys
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.services.vector_store import COLLECTION_NAME, get_engine, get_vector_store
+from app.services.vector_writer import BulkVectorWriter
+
+
+def make_rows(count: int, dimension: int, session_id: str):
+    texts = [f"benchmark chunk {i} " * 20 for i in range(count)]
+    vectors = [[random.random() for _ in range(dimension)] for _ in range(count)]
+    metadatas = [{"session_id": session_id, "chunk_id": i} for i in range(count)]
+    return texts, vectors, metadatas
+
+
+def cleanup(session_id: str):
+    with get_engine().begin() as conn:
+        conn.execute(
+            text(
+                """
+                DELETE FROM langchain_pg_embedding e
+                USING langchain_pg_collection c
+                WHERE c.uuid = e.collection_id AND c.name = :collection
+                  AND e.cmetadata->>'session_id' = :session_id
+                """
+            ),
+            {"collection": COLLECTION_NAME, "session_id": session_id},
+        )
+
+
+def run(name: str, write, count: int, dimension: int):
+    session_id = f"bench-{uuid.uuid4()}"
+    texts, vectors, metadatas = make_rows(count, dimension, session_id)
+    start = time.perf_counter()
+    try:
+        write(texts, vectors, metadatas)
+        elapsed = time.perf_counter() - start
+    finally:
+        cleanup(session_id)
+    print(f"{name:<12} {count} rows in {elapsed:.2f}s -> {count / elapsed:,.0f} rows/s")
+
+
+def orm_write(texts, vectors, metadatas):
+    get_vector_store().add_embeddings(texts, vectors, metadatas=metadatas)
+
+
+def bulk_write(method):
+    def write(texts, vectors, metadatas):
+        with BulkVectorWriter(method=method) as writer:
+            writer.add(texts, vectors, metadatas)
+    return write
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    dimension = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+
+    run("orm", orm_write, count, dimension)
+    run("copy", bulk_write("copy"), count, dimension)
+    run("insert", bulk_write("insert"), count, dimension)
@@ -315,21 +315,25 @@ export default function useChatLogic() {
     try {
       const reader = await sendPromptStream({ prompt: input, sessionId: currentSession.id });
       let responseText = "";
+      let buffer = "";
       const decoder = new TextDecoder();
   
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
   
-        const chunk = decoder.decode(value, { stream: true });
-        const lines = chunk.split("\n").filter(line => line.trim().startsWith("data:"));
+        // Token events are small, so a read can end in the middle of a line.
+        buffer += decoder.decode(value, { stream: true });
+        const parts = buffer.split("\n");
+        buffer = parts.pop() ?? "";
+        const lines = parts.filter(line => line.trim().startsWith("data:"));
   
         for (const line of lines) {
           try {
             const parsed = JSON.parse(line.replace("data: ", "").trim());
-            if (parsed.answer) {
-              responseText += parsed.answer;
-              if (parsed.references) references = parsed.references;
+            if (parsed.references) references = parsed.references;
+            if (parsed.answer || parsed.references) {
+              responseText += parsed.answer ?? "";
               setMessages(prev => prev.map(m =>
                 m.id === aiMessageId ? {
                   ...m,
@@ -521,27 +525,30 @@ export default function useChatLogic() {
         sessionId: currentSession.id,
       });
       let responseText = "";
+      let references: any[] = [];
+      let buffer = "";
       const decoder = new TextDecoder();
 
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value, { stream: true });
-        const lines = chunk
-          .split("\n")
-          .filter((line) => line.trim().startsWith("data:"));
+        buffer += decoder.decode(value, { stream: true });
+        const parts = buffer.split("\n");
+        buffer = parts.pop() ?? "";
+        const lines = parts.filter((line) => line.trim().startsWith("data:"));
         for (const line of lines) {
           const jsonStr = line.replace("data: ", "").trim();
           if (!jsonStr) continue;
           try {
             const parsed = JSON.parse(jsonStr);
-            if (parsed.answer) {
-              responseText += parsed.answer;
+            if (parsed.references) references = parsed.references;
+            if (parsed.answer || parsed.references) {
+              responseText += parsed.answer ?? "";
               setMessages((prev) =>
                 prev.map((m) =>
                   m.id === aiMessageId
-                    ? { ...m, content: responseText, references: parsed.references ?? [] }
+                    ? { ...m, content: responseText, references }
                     : m
                 )
               );
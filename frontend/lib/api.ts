@@ -78,6 +78,30 @@ export async function uploadPDFs(files: File[], sessionId: string) {
       const errorText = await res.text()
       throw new Error(`Upload failed: ${errorText}`)
     }
+
+    const { job_id } = await res.json()
+    await waitForUploadJob(job_id, token)
+  }
+}
+
+async function waitForUploadJob(jobId: string, token: string) {
+  while (true) {
+    const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/upload/jobs/${jobId}`, {
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    })
+
+    if (!res.ok) {
+      const errorText = await res.text()
+      throw new Error(`Upload status check failed: ${errorText}`)
+    }
+
+    const job = await res.json()
+    if (job.status === "done") return job
+    if (job.status === "failed") throw new Error(`PDF indexing failed: ${job.error}`)
+
+    await new Promise((resolve) => setTimeout(resolve, 1000))
   }
 }
 
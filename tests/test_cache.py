@@ -0,0 +1,62 @@
+import pytest
+
+from app import cache
+from app.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    entries = TTLCache(maxsize=10, ttl=5)
+    entries.set("a", 1)
+
+    clock[0] += 4.9
+    assert entries.get("a") == 1
+    clock[0] += 0.2
+    assert entries.get("a") is None
+    assert len(entries) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    entries = TTLCache(maxsize=2, ttl=60)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+
+    assert entries.get("b") is None
+    assert entries.get("a") == 1
+    assert entries.get("c") == 3
+
+
+def test_set_refreshes_the_ttl(clock):
+    entries = TTLCache(maxsize=10, ttl=5)
+    entries.set("a", 1)
+    clock[0] += 4
+    entries.set("a", 2)
+    clock[0] += 4
+
+    assert entries.get("a") == 2
+
+
+def test_falsy_values_are_cached(clock):
+    entries = TTLCache(maxsize=10, ttl=5)
+    entries.set("empty", "")
+
+    assert entries.get("empty", "missing") == ""
+
+
+def test_pop_and_clear(clock):
+    entries = TTLCache(maxsize=10, ttl=5)
+    entries.set("a", 1)
+    entries.set("b", 2)
+
+    assert entries.pop("a") == 1
+    assert entries.pop("a", "gone") == "gone"
+    entries.clear()
+    assert len(entries) == 0
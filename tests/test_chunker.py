@@ -0,0 +1,105 @@
+import pytest
+from langchain_core.documents import Document
+
+from app.services import chunker
+from app.services.chunker import StructuredChunker
+
+
+class WhitespaceTokenizer:
+    """One token per whitespace-separated word."""
+
+    def encode(self, text, add_special_tokens=False):
+        return text.split()
+
+    def decode(self, ids):
+        return " ".join(ids)
+
+
+@pytest.fixture(autouse=True)
+def tokenizer(monkeypatch):
+    monkeypatch.setattr(chunker, "_tokenizer", WhitespaceTokenizer())
+
+
+def element(category, text, page=1):
+    return Document(page_content=text, metadata={"category": category, "page_number": page})
+
+
+def split(elements, max_tokens=8, min_tokens=4):
+    return list(StructuredChunker(max_tokens=max_tokens, min_tokens=min_tokens).split(elements))
+
+
+def test_heading_starts_the_chunk_holding_its_section():
+    chunks = split([
+        element("Title", "Intro"),
+        element("Text", "a b c"),
+        element("Title", "Section Two"),
+        element("Text", "d e f g h i"),
+    ])
+
+    assert chunks[0].page_content == "Intro\n\na b c"
+    assert chunks[1].page_content.startswith("Section Two\n\nd")
+    assert all(not chunk.page_content.endswith("Section Two") for chunk in chunks)
+    assert all(chunk.metadata["section"] == "Section Two" for chunk in chunks[1:])
+
+
+def test_short_section_is_continued_when_the_next_one_fits():
+    chunks = split(
+        [element("Title", "Intro"), element("Text", "a b"), element("Title", "Two"), element("Text", "c d")],
+        max_tokens=12,
+    )
+
+    assert [chunk.page_content for chunk in chunks] == ["Intro\n\na b\n\nTwo\n\nc d"]
+
+
+def test_trailing_heading_becomes_its_own_chunk():
+    chunks = split([element("Title", "Intro"), element("Text", "a b c d e"), element("Title", "Appendix", page=3)])
+
+    assert chunks[-1].page_content == "Appendix"
+    assert chunks[-1].metadata["category"] == "Title"
+    assert chunks[-1].metadata["page_number"] == 3
+    assert "Appendix" not in chunks[0].page_content
+
+
+def test_consecutive_headings_are_stacked():
+    chunks = split([element("Title", "A"), element("Title", "B"), element("Text", "x y z")], max_tokens=12)
+
+    assert [chunk.page_content for chunk in chunks] == ["A\nB\n\nx y z"]
+
+
+def test_table_gets_its_own_chunk():
+    chunks = split(
+        [element("Text", "p q r s t"), element("Table", "h1 | h2\nv1 | v2"), element("Text", "u v w x")],
+        max_tokens=12,
+    )
+
+    assert [chunk.metadata["category"] for chunk in chunks] == ["Text", "Table", "Text"]
+    assert chunks[1].page_content == "h1 | h2\nv1 | v2"
+
+
+def test_large_table_is_split_by_rows():
+    rows = [f"r{i} | a | b" for i in range(6)]
+    chunks = split([element("Table", "\n".join(rows))], max_tokens=12)
+
+    assert len(chunks) > 1
+    assert all(chunk.metadata["category"] == "Table" for chunk in chunks)
+    assert "\n".join(chunk.page_content for chunk in chunks).split("\n") == rows
+
+
+def test_oversize_element_is_split_at_sentences_then_tokens():
+    sentences = "a b c d e. f g h i j. " + " ".join(f"w{i}" for i in range(20))
+    chunks = split([element("Text", sentences)])
+
+    assert chunks[0].page_content == "a b c d e."
+    assert chunks[1].page_content == "f g h i j."
+    assert all(chunk.metadata["token_count"] <= 8 for chunk in chunks)
+    assert " ".join(chunk.page_content for chunk in chunks).split() == sentences.split()
+
+
+def test_chunks_never_exceed_max_tokens_with_section_prefix():
+    elements = [element("Title", "A rather long heading"), element("Text", " ".join(f"w{i}" for i in range(30)))]
+
+    chunks = split(elements, max_tokens=16)
+
+    assert len(chunks) > 1
+    assert all(chunk.metadata["token_count"] <= 16 for chunk in chunks)
+    assert all(chunk.page_content.startswith("A rather long heading\n\n") for chunk in chunks)
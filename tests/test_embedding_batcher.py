@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.embedding_batcher import QueryBatcher
+
+
+class RecordingEncoder:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(self.delay)
+        return [[float(len(text))] for text in texts]
+
+
+def embed_concurrently(batcher, texts):
+    results = {}
+
+    def worker(text):
+        results[text] = batcher.embed([text])[0]
+
+    threads = [threading.Thread(target=worker, args=(text,)) for text in texts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_queries_share_one_batch():
+    encode = RecordingEncoder()
+    batcher = QueryBatcher(encode, max_size=32, max_wait_ms=200)
+
+    results = embed_concurrently(batcher, ["a", "bb", "ccc", "dddd"])
+
+    assert len(encode.batches) == 1
+    assert sorted(encode.batches[0]) == ["a", "bb", "ccc", "dddd"]
+    assert results == {"a": [1.0], "bb": [2.0], "ccc": [3.0], "dddd": [4.0]}
+
+
+def test_batches_are_capped_at_max_size():
+    encode = RecordingEncoder()
+    batcher = QueryBatcher(encode, max_size=3, max_wait_ms=50)
+
+    vectors = batcher.embed([f"q{i}" for i in range(7)])
+
+    assert [len(batch) for batch in encode.batches] == [3, 3, 1]
+    assert vectors == [[2.0]] * 7
+
+
+def test_lone_query_is_flushed_after_max_wait():
+    batcher = QueryBatcher(RecordingEncoder(), max_size=32, max_wait_ms=30)
+
+    start = time.perf_counter()
+    batcher.embed(["alone"])
+    elapsed = time.perf_counter() - start
+
+    assert 0.02 <= elapsed < 1.0
+
+
+def test_identical_texts_are_encoded_once():
+    encode = RecordingEncoder()
+    batcher = QueryBatcher(encode, max_wait_ms=50)
+
+    assert batcher.embed(["same", "same", "other"]) == [[4.0], [4.0], [5.0]]
+    assert encode.batches == [["same", "other"]]
+
+
+def test_encode_error_reaches_every_caller():
+    def fail(texts):
+        raise ValueError("model unavailable")
+
+    batcher = QueryBatcher(fail, max_wait_ms=50)
+    futures = batcher.submit(["a", "b", "c"])
+
+    for future in futures:
+        with pytest.raises(ValueError, match="model unavailable"):
+            future.result(timeout=5)
+    # The worker survives a failed batch.
+    batcher.encode = RecordingEncoder()
+    assert batcher.embed(["d"]) == [[1.0]]
+
+
+def test_async_callers_are_batched_without_blocking_the_loop():
+    encode = RecordingEncoder(delay=0.01)
+    batcher = QueryBatcher(encode, max_wait_ms=100)
+
+    async def main():
+        return await asyncio.gather(*(batcher.aembed([f"x{i}"]) for i in range(5)))
+
+    results = asyncio.run(main())
+
+    assert results == [[[2.0]]] * 5
+    assert len(encode.batches) == 1
@@ -0,0 +1,46 @@
+import os
+import threading
+
+import pytest
+
+from app.services import embeddings
+
+
+@pytest.fixture
+def onnx_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "EMBEDDING_ONNX_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_concurrent_exports_run_once(onnx_dir, monkeypatch):
+    calls = []
+
+    def export(path):
+        calls.append(path)
+        with open(path, "w") as f:
+            f.write("model")
+
+    monkeypatch.setattr(embeddings, "_export_fp32", export)
+    threads = [threading.Thread(target=embeddings.export_onnx, args=(False,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    with open(embeddings.onnx_model_path(False)) as f:
+        assert f.read() == "model"
+
+
+def test_failed_export_leaves_no_model(onnx_dir, monkeypatch):
+    def export(path):
+        with open(path, "w") as f:
+            f.write("partial")
+        raise RuntimeError("export crashed")
+
+    monkeypatch.setattr(embeddings, "_export_fp32", export)
+    with pytest.raises(RuntimeError):
+        embeddings.export_onnx(False)
+
+    model_dir = os.path.dirname(embeddings.onnx_model_path(False))
+    assert os.listdir(model_dir) == ["export.lock"]
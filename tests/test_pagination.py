@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql
+
+from app.auth.routes import messages_page_query, sessions_page_query, with_queued
+from app.models import ChatMessage, ChatSession
+from app.services.message_writer import PendingMessage
+
+
+def sql(query) -> str:
+    return " ".join(str(query.compile(dialect=postgresql.dialect())).split())
+
+
+def test_messages_without_cursor_or_limit_returns_whole_session():
+    query = sql(messages_page_query("s1"))
+    assert "LIMIT" not in query
+    assert "(chat_messages.timestamp, chat_messages.id) <" not in query
+    assert "ORDER BY chat_messages.timestamp DESC, chat_messages.id DESC" in query
+
+
+def test_messages_before_cursor_pages_backwards():
+    cursor = ChatMessage(id=7, timestamp=datetime(2024, 1, 1))
+    query = sql(messages_page_query("s1", cursor, newer=False, limit=20))
+    assert "(chat_messages.timestamp, chat_messages.id) < (" in query
+    assert "ORDER BY chat_messages.timestamp DESC, chat_messages.id DESC" in query
+    assert "LIMIT" in query
+
+
+def test_messages_after_cursor_pages_forwards():
+    cursor = ChatMessage(id=7, timestamp=datetime(2024, 1, 1))
+    query = sql(messages_page_query("s1", cursor, newer=True, limit=20))
+    assert "(chat_messages.timestamp, chat_messages.id) > (" in query
+    assert "ORDER BY chat_messages.timestamp ASC, chat_messages.id ASC" in query
+
+
+def test_messages_without_attachments_skips_the_column():
+    assert "attachments" not in sql(messages_page_query("s1", attachments=False))
+    assert "attachments" in sql(messages_page_query("s1"))
+
+
+def test_sessions_cursor_uses_last_active_and_id():
+    cursor = ChatSession(id=3, last_active=datetime(2024, 1, 1))
+    query = sql(sessions_page_query(1, cursor, limit=10))
+    assert "(chat_sessions.last_active, chat_sessions.id) < (" in query
+    assert "ORDER BY chat_sessions.last_active DESC, chat_sessions.id DESC" in query
+    assert "LIMIT" in query
+
+
+def test_sessions_without_limit_are_not_truncated():
+    assert "LIMIT" not in sql(sessions_page_query(1))
+
+
+def test_queued_messages_are_appended_once():
+    written = PendingMessage("s1", "user", "hello", [], None)
+    written.future.set_result(11)
+    queued = PendingMessage("s1", "bot", "hi there", [], None)
+    rows = [{"id": 11, "session_id": "s1", "sender": "user", "content": "hello",
+             "timestamp": written.timestamp, "attachments": []}]
+
+    messages = with_queued(rows, [written, queued], attachments=True)
+
+    assert [m["content"] for m in messages] == ["hello", "hi there"]
+    assert messages[1]["id"] is None
+    assert "attachments" not in with_queued([], [queued], attachments=False)[0]
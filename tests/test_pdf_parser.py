@@ -0,0 +1,7 @@
+from app.services.pdf_parser import format_table
+
+
+def test_format_table_joins_cells_and_drops_empty_rows():
+    rows = [["Item", "Qty"], [None, None], ["Pump\nunit", "2"], ["Valve", None]]
+
+    assert format_table(rows) == "Item | Qty\nPump unit | 2\nValve | "
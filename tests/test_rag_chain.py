@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+
+from app import rag_chain
+
+CONFIG = {"configurable": {"session_id": "s1", "query_mode": "heuristic"}}
+DOC = Document(page_content="The rent is 4,200 USD.", metadata={"filename": "lease.pdf", "page_number": 3})
+
+
+class FakeRetriever:
+    def __init__(self):
+        self.calls = []
+
+    def get_many(self, queries, known_vectors=None):
+        self.calls.append((queries, known_vectors))
+        return [DOC]
+
+    async def aget_many(self, queries, known_vectors=None):
+        return self.get_many(queries, known_vectors)
+
+
+@pytest.fixture
+def retriever(monkeypatch):
+    retriever = FakeRetriever()
+    monkeypatch.setattr(rag_chain, "llm", FakeListChatModel(responses=["It is 4,200 USD."]))
+    monkeypatch.setattr(rag_chain, "session_retriever", lambda *args, **kwargs: retriever)
+    monkeypatch.setattr(rag_chain, "count_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(rag_chain, "document_set_fingerprint", lambda session_id: None)
+    return retriever
+
+
+def merge(chunks):
+    output = {}
+    for chunk in chunks:
+        for key, value in chunk.items():
+            output[key] = output.get(key, "") + value if key == "answer" else value
+    return output
+
+
+async def collect(chain, x):
+    return [chunk async for chunk in chain.astream(x, CONFIG)]
+
+
+def question():
+    return {"question": "How much is the rent?", "chat_history": []}
+
+
+def test_answer_chain_streams(retriever):
+    x = {**question(), "queries": ["How much is the rent?"]}
+
+    chunks = asyncio.run(collect(rag_chain.old_chain, x))
+
+    assert chunks[0] == {"references": rag_chain.format_references([DOC])}
+    output = merge(chunks)
+    assert output["answer"] == "It is 4,200 USD."
+    assert output["done"] is True
+    assert merge(rag_chain.old_chain.stream(x, CONFIG))["answer"] == "It is 4,200 USD."
+
+
+def test_planned_chain_streams(retriever):
+    chain = RunnableLambda(rag_chain.plan_queries) | RunnableLambda(rag_chain.answer_with_cache)
+
+    output = merge(asyncio.run(collect(chain, question())))
+
+    assert output["answer"] == "It is 4,200 USD."
+    assert output["references"][0]["source"] == "lease.pdf"
+
+
+def test_lexical_shortcut_streams(retriever, monkeypatch):
+    monkeypatch.setattr(rag_chain, "retrieval_mode", lambda config: "hybrid")
+    monkeypatch.setattr(rag_chain.vector_store, "exact_match", lambda session_id, text: [DOC])
+    chain = RunnableLambda(rag_chain.plan_queries) | RunnableLambda(rag_chain.answer_with_cache)
+
+    output = merge(asyncio.run(collect(chain, question())))
+
+    assert output["answer"] == "It is 4,200 USD."
+    assert retriever.calls == []
+
+
+def test_cache_miss_reuses_question_vector(retriever, monkeypatch):
+    monkeypatch.setattr(rag_chain, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(rag_chain, "document_set_fingerprint", lambda session_id: "abc")
+    monkeypatch.setattr(rag_chain.embeddings, "embed_query", lambda text: [1.0, 0.0])
+    monkeypatch.setattr(rag_chain, "semantic_cache", rag_chain.SemanticCache(
+        max_sets=4, entries_per_set=4, ttl=60, threshold=0.95,
+    ))
+    chain = RunnableLambda(rag_chain.plan_queries) | RunnableLambda(rag_chain.answer_with_cache)
+
+    output = merge(asyncio.run(collect(chain, question())))
+
+    assert output["answer"] == "It is 4,200 USD."
+    queries, known_vectors = retriever.calls[0]
+    assert known_vectors == {"How much is the rent?": [1.0, 0.0]}
+    assert "question_vector" not in output
@@ -0,0 +1,45 @@
+import asyncio
+import io
+import threading
+
+import pytest
+
+from app.services import transcription
+
+
+@pytest.fixture
+def local_backend(monkeypatch):
+    release = threading.Event()
+    backend = transcription.LocalWhisperBackend()
+
+    def slow_transcribe(data):
+        release.wait(5)
+        return "done"
+
+    monkeypatch.setattr(backend, "_transcribe", slow_transcribe)
+    monkeypatch.setattr(transcription, "backend", backend)
+    monkeypatch.setattr(transcription, "TRANSCRIPTION_TIMEOUT", 0.05)
+    monkeypatch.setattr(transcription, "_slots", None)
+    yield release
+    release.set()
+
+
+def test_timed_out_worker_keeps_its_slot(monkeypatch, local_backend):
+    monkeypatch.setattr(transcription, "TRANSCRIPTION_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(transcription, "TRANSCRIPTION_QUEUE_TIMEOUT", 0.05)
+
+    async def main():
+        with pytest.raises(transcription.TranscriptionTimeout):
+            await transcription.transcribe(io.BytesIO(b"a"), "a.wav", "audio/wav")
+        # The first worker is still running, so there is no free slot.
+        with pytest.raises(transcription.TranscriptionBusy):
+            await transcription.transcribe(io.BytesIO(b"b"), "b.wav", "audio/wav")
+
+        local_backend.set()
+        for _ in range(100):
+            if not transcription._slots.locked():
+                break
+            await asyncio.sleep(0.01)
+        assert not transcription._slots.locked()
+
+    asyncio.run(main())
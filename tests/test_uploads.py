@@ -0,0 +1,45 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.services.uploads import UploadSizeLimit
+
+BOUNDARY = "upload-boundary"
+
+
+def make_client(max_bytes):
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimit, path="/upload", max_bytes=max_bytes)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return TestClient(app)
+
+
+def chunked_form(size):
+    # A generator body is sent without a Content-Length.
+    body = (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="a.pdf"\r\n\r\n'.encode()
+        + b"a" * size
+        + f"\r\n--{BOUNDARY}--\r\n".encode()
+    )
+    for i in range(0, len(body), 8192):
+        yield body[i:i + 8192]
+
+
+def test_upload_under_the_limit_passes():
+    response = make_client(1000).post("/upload", files={"file": ("a.pdf", b"a" * 500)})
+
+    assert response.json() == {"size": 500}
+
+
+def test_body_without_content_length_is_cut_off():
+    response = make_client(1000).post(
+        "/upload",
+        content=chunked_form(200_000),
+        headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+
+    assert "content-length" not in response.request.headers
+    assert response.status_code == 413
@@ -0,0 +1,73 @@
+import pytest
+from langchain_core.documents import Document
+
+from app.services import vector_store
+from app.services.vector_store import exact_terms, lexical_terms, reciprocal_rank_fusion
+
+
+def chunk(chunk_id, text=None):
+    return Document(page_content=text or f"chunk {chunk_id}", metadata={"filename": "a.pdf", "chunk_id": chunk_id})
+
+
+@pytest.mark.parametrize("question", [
+    "Summarize page 12",
+    "What happened in 2023?",
+    "What is covered in the first 24 months?",
+    "Explain the well-known e-mail policy",
+    "How much is 1,450 W?",
+])
+def test_plain_numbers_and_words_are_not_exact_terms(question):
+    assert exact_terms(question) == []
+
+
+@pytest.mark.parametrize("question, terms", [
+    ("What does clause 7.4 say?", ["7.4"]),
+    ("What is the amount of INV-2024-0318?", ["INV-2024-0318"]),
+    ("Changes between v2.1 and 4.2.1 for ABC-123.", ["v2.1", "4.2.1", "ABC-123"]),
+    ('Any "pressure sensor" problem?', ["pressure sensor"]),
+])
+def test_identifiers_and_quoted_phrases_are_exact_terms(question, terms):
+    assert exact_terms(question) == terms
+
+
+def test_lexical_terms_drop_stopwords_and_duplicates():
+    assert lexical_terms("What is the rent and the deposit of the rent?") == ["rent", "deposit"]
+
+
+def test_rrf_prefers_chunks_ranked_in_several_lists():
+    a, b, c = chunk(1), chunk(2), chunk(3)
+
+    fused = reciprocal_rank_fusion([[a, b, c], [c, b], [b]])
+
+    assert [doc.metadata["chunk_id"] for doc in fused] == [2, 3, 1]
+
+
+def test_rrf_merges_equal_chunks_from_different_lists():
+    fused = reciprocal_rank_fusion([[chunk(1)], [chunk(1)], [chunk(2)]])
+
+    assert [doc.metadata["chunk_id"] for doc in fused] == [1, 2]
+
+
+def test_rrf_of_nothing_is_empty():
+    assert reciprocal_rank_fusion([[], []]) == []
+
+
+def test_known_query_vectors_are_not_embedded_again(monkeypatch):
+    embedded = []
+    searched = []
+
+    def embed_queries(texts):
+        embedded.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    def search(session_id, vector, k):
+        searched.append(vector)
+        return [(chunk(int(vector[0])), 0.0)]
+
+    monkeypatch.setattr(vector_store.embeddings, "embed_queries", embed_queries)
+    monkeypatch.setattr(vector_store, "search", search)
+
+    vector_store.search_many("s1", ["question", "key words"], known_vectors={"question": [0.0]})
+
+    assert embedded == [["key words"]]
+    assert searched == [[0.0], [9.0]]